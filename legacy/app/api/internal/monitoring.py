@@ -3,6 +3,7 @@ import structlog
 import time
 from app.models.worker import WorkerStatus
 from app.core.redis import get_redis
+from app.services.queue_backend import get_worker_queue
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -30,6 +31,9 @@ async def worker_heartbeat(
     })
     await redis.expire(key, 300) # 5 minute TTL
     
+    # A live worker keeps the leases on its in-flight tasks
+    await get_worker_queue(redis).renew_leases(worker_id)
+    
     logger.info("heartbeat_received", worker_id=worker_id)
     
     return {"acknowledged": True, "commands": []}
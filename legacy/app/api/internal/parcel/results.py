@@ -1,59 +1,81 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import List
-import structlog
 from app.models.worker import ParcelResult, SubmitResponse
-from app.services.worker_queue import WorkerQueue
+from app.services.queue_backend import get_worker_queue
 from app.services.properties import PropertyService
+from app.services.cache import CacheService
+from app.services.results import process_results
+from app.services.ingest import ResultIngest
+from app.services.result_stream import (
+    submit_result_stream,
+    RecordTooLarge,
+    NDJSON_MEDIA_TYPES,
+    MSGPACK_MEDIA_TYPES,
+)
 from app.core.redis import get_redis
 from app.core.db import get_db
 from sqlalchemy.ext.asyncio import AsyncSession
 
-logger = structlog.get_logger()
 router = APIRouter()
 
 @router.post("/results", response_model=SubmitResponse)
 async def submit_results(
     request: Request,
     results: List[ParcelResult],
+    mode: str = Query("sync", pattern="^(sync|async)$"),
     redis = Depends(get_redis),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Parser workers submit results to this endpoint.
     Data is persisted to PostgreSQL and tasks are marked as complete in the queue.
+    With mode=async the batch is queued for the ingest writers and acknowledged
+    right away; tasks are completed once it has been written.
     """
     auth = request.state.auth
     worker_id = auth.worker_id or "unknown"
     
-    queue = WorkerQueue(redis)
-    property_service = PropertyService(db)
+    if mode == "async":
+        await ResultIngest(redis).enqueue(results, worker_id)
+        return SubmitResponse(inserted=0, updated=0, failed=0, queued=len(results))
     
-    inserted = 0
-    updated = 0
-    failed = 0
-    errors = []
+    queue = get_worker_queue(redis)
+    property_service = PropertyService(db, cache=CacheService(redis))
+
+    return await process_results(property_service, queue, results, worker_id)
+
+@router.post("/results/stream", response_model=SubmitResponse)
+async def submit_results_stream(
+    request: Request,
+    mode: str = Query("sync", pattern="^(sync|async)$"),
+    redis = Depends(get_redis),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Streaming variant of /results for large submissions.
+    The body is newline-delimited JSON (application/x-ndjson) or a msgpack stream
+    (application/msgpack) of results, parsed as it arrives and written in bounded chunks.
+    Invalid records are reported in errors without rejecting the rest; a msgpack
+    stream that cannot be decoded further is reported as one error and the rest skipped.
+    Chunks are committed as they fill, so when the request fails part way
+    (e.g. 413 for an oversized record) the chunks before it stay written and
+    their tasks completed.
+    """
+    auth = request.state.auth
+    worker_id = auth.worker_id or "unknown"
+    
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in NDJSON_MEDIA_TYPES | MSGPACK_MEDIA_TYPES:
+        raise HTTPException(status_code=415, detail="Expected application/x-ndjson or application/msgpack")
     
-    for res in results:
-        try:
-            # 1. Persist to PostgreSQL
-            is_new = await property_service.upsert_parcel(res, worker_id)
-            if is_new:
-                inserted += 1
-            else:
-                updated += 1
-                
-            # 2. Mark task as completed in the queue
-            await queue.complete_task(worker_id, res.task_id)
-            
-            logger.info("result_processed", task_id=res.task_id, parcel_id=res.parcel_id, worker_id=worker_id)
-        except Exception as e:
-            failed += 1
-            errors.append(str(e))
-            logger.error("result_processing_failed", task_id=res.task_id, error=str(e))
-            
-    return SubmitResponse(
-        inserted=inserted,
-        updated=updated,
-        failed=failed,
-        errors=errors
-    )
+    try:
+        return await submit_result_stream(
+            request.stream(),
+            media_type,
+            worker_id,
+            PropertyService(db, cache=CacheService(redis)),
+            get_worker_queue(redis),
+            ingest=ResultIngest(redis) if mode == "async" else None
+        )
+    except RecordTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
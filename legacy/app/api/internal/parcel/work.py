@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, Query, Request
 from typing import List, Optional
 from app.models.worker import WorkResponse
-from app.services.worker_queue import WorkerQueue
+from app.services.queue_backend import get_worker_queue
 from app.core.redis import get_redis
 
 router = APIRouter()
@@ -11,23 +11,32 @@ async def get_work(
     request: Request,
     capacity: int = Query(10, ge=1, le=100),
     platforms: List[str] = Query(...),
+    wait: int = Query(0, ge=0, le=60),
     redis = Depends(get_redis)
 ):
     """
     Parser workers pull tasks from this endpoint.
     Requires X-Worker-Token and X-Worker-ID.
+    With `wait`, long-polls up to that many seconds for tasks to arrive.
     """
     auth = request.state.auth
     worker_id = auth.worker_id or "unknown"
     
-    queue = WorkerQueue(redis)
+    queue = get_worker_queue(redis)
     tasks = await queue.pop_tasks(
         worker_id=worker_id,
         platforms=platforms,
-        capacity=capacity
+        capacity=capacity,
+        wait=wait
     )
     
+    # After a long-poll times out the worker can reconnect right away
+    if tasks:
+        retry_after = 5
+    else:
+        retry_after = 0 if wait else 30
+    
     return WorkResponse(
         tasks=tasks,
-        retry_after=30 if not tasks else 5
+        retry_after=retry_after
     )
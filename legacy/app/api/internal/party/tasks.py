@@ -1,11 +1,27 @@
-from fastapi import APIRouter, Depends, Path, Request
+from fastapi import APIRouter, Depends, Path, Query, Request
+from typing import List, Optional
 import structlog
-from app.services.worker_queue import WorkerQueue
+from app.models.worker import WorkTask, EnqueueResponse, TaskFailReport, TaskFailResponse, DeadLetterList
+from app.services.queue_backend import get_worker_queue
 from app.core.redis import get_redis
 
 logger = structlog.get_logger()
 router = APIRouter()
 
+@router.post("/tasks/bulk", response_model=EnqueueResponse)
+async def enqueue_tasks(
+    tasks: List[WorkTask],
+    redis = Depends(get_redis)
+):
+    """
+    Enqueue a batch of tasks.
+    Tasks whose (platform, target) is already queued or in flight are skipped.
+    """
+    queue = get_worker_queue(redis)
+    queued, duplicates = await queue.push_tasks(tasks)
+    
+    return EnqueueResponse(queued=queued, duplicates=duplicates)
+
 @router.post("/tasks/{task_id}/complete")
 async def complete_task(
     request: Request,
@@ -18,24 +34,50 @@ async def complete_task(
     auth = request.state.auth
     worker_id = auth.worker_id or "unknown"
     
-    queue = WorkerQueue(redis)
+    queue = get_worker_queue(redis)
     success = await queue.complete_task(worker_id, task_id)
     
     return {"success": success}
 
-@router.post("/tasks/{task_id}/fail")
+@router.post("/tasks/{task_id}/fail", response_model=TaskFailResponse)
 async def fail_task(
     request: Request,
     task_id: str = Path(...),
+    report: Optional[TaskFailReport] = None,
     redis = Depends(get_redis)
 ):
     """
-    Mark a task as failed. In MVP: just log it.
-    TODO: Implement retry logic or DLQ.
+    Mark a task as failed.
+    The task is retried with exponential backoff and dead-lettered after too many attempts.
     """
     auth = request.state.auth
     worker_id = auth.worker_id or "unknown"
     
-    logger.error("task_failed", worker_id=worker_id, task_id=task_id)
+    queue = get_worker_queue(redis)
+    return await queue.fail_task(worker_id, task_id, error=report.error if report else None)
+
+@router.get("/dlq", response_model=DeadLetterList)
+async def list_dead_letters(
+    limit: int = Query(100, ge=1, le=1000),
+    redis = Depends(get_redis)
+):
+    """
+    Inspect tasks that exhausted their retries.
+    """
+    queue = get_worker_queue(redis)
+    total, tasks = await queue.list_dead_letters(limit=limit)
     
-    return {"status": "reported"}
+    return DeadLetterList(total=total, tasks=tasks)
+
+@router.post("/dlq/{task_id}/replay")
+async def replay_dead_letter(
+    task_id: str = Path(...),
+    redis = Depends(get_redis)
+):
+    """
+    Put a dead-lettered task back on its queue.
+    """
+    queue = get_worker_queue(redis)
+    success = await queue.replay_dead_letter(task_id)
+    
+    return {"success": success}
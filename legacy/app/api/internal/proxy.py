@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-import httpx
 import structlog
 from app.models.worker import ProxyInfo
 from app.core.config import settings
+from app.services.http_client import http_clients
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -17,19 +17,19 @@ async def create_proxy(
     Proxies request to the internal tor-socks-proxy service.
     """
     # For MVP: Proxying to the internal service
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                f"{settings.PROXY_SERVICE_URL}/create",
-                params={"platform": platform},
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return ProxyInfo(**response.json())
-        except Exception as e:
-            logger.error("proxy_creation_failed", platform=platform, error=str(e))
-            # Fallback or error
-            raise HTTPException(status_code=502, detail="Proxy service unavailable")
+    client = http_clients.get(settings.PROXY_SERVICE_URL)
+    try:
+        response = await client.get(
+            "/create",
+            params={"platform": platform},
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return ProxyInfo(**response.json())
+    except Exception as e:
+        logger.error("proxy_creation_failed", platform=platform, error=str(e))
+        # Fallback or error
+        raise HTTPException(status_code=502, detail="Proxy service unavailable")
 
 @router.post("/proxy/{port}/rotate", response_model=ProxyInfo)
 async def rotate_proxy(
@@ -41,15 +41,15 @@ async def rotate_proxy(
     """
     Rotate a proxy that is banned or slow.
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{settings.PROXY_SERVICE_URL}/rotate/{port}",
-                params={"platform": platform, "reason": reason},
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return ProxyInfo(**response.json())
-        except Exception as e:
-            logger.error("proxy_rotation_failed", port=port, error=str(e))
-            raise HTTPException(status_code=502, detail="Proxy service unavailable")
+    client = http_clients.get(settings.PROXY_SERVICE_URL)
+    try:
+        response = await client.post(
+            f"/rotate/{port}",
+            params={"platform": platform, "reason": reason},
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return ProxyInfo(**response.json())
+    except Exception as e:
+        logger.error("proxy_rotation_failed", port=port, error=str(e))
+        raise HTTPException(status_code=502, detail="Proxy service unavailable")
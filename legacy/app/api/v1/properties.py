@@ -1,93 +1,81 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from starlette.responses import Response
 import structlog
 from app.services.http_client import ServiceClient
 from app.core.config import settings
 
-from app.services.cache import get_cache_service
-from app.core.redis import get_redis
+from app.services.cache import property_cache_key, PROPERTY_CACHE_POLICY, SEARCH_CACHE_POLICY
+from app.core.response_cache import response_cache
+from app.services.visibility import project_fields, field_set_version, CANONICAL_TIER
 
 from app.core.authorization import enforce_tier
 
 logger = structlog.get_logger()
 router = APIRouter()
 
-parser_client = ServiceClient(settings.PARSER_SERVICE_URL, "parser")
+parser_client = ServiceClient(settings.PARSER_SERVICE_URL, "parser", hedge=True)
 
 @router.get("/properties/{parcel_id}")
 async def get_property(
     parcel_id: str, 
     request: Request, 
-    redis = Depends(get_redis),
-    _tier_check = Depends(enforce_tier("daily_details"))
+    _tier_check = Depends(enforce_tier("daily_details")),
+    cache = Depends(response_cache("property", PROPERTY_CACHE_POLICY))
 ):
     """
     Proxy request to Parser Service for property details.
     """
     auth = request.state.auth
     
-    # Cache key depends on parcel_id and user tier (since visibility might vary)
-    cache_key = f"cache:prop:{parcel_id}:{auth.tier.value}"
-    
-    # Try cache
-    cached_data = await redis.get(cache_key)
-    if cached_data:
-        return Response(
-            content=cached_data,
-            media_type="application/json",
-            headers={"X-Cache": "HIT"}
-        )
-
+    # Every tier shares one cached payload with all fields; each gets its
+    # visible fields projected from it
     headers = {
-        "X-User-ID": auth.user_id or "anonymous",
-        "X-User-Tier": auth.tier.value,
+        **cache.upstream_headers(CANONICAL_TIER),
         "X-Request-ID": request.headers.get("X-Request-ID", "")
     }
-    
-    try:
+
+    async def fetch_property():
         response = await parser_client.request(
             "GET", 
             f"/api/v1/properties/{parcel_id}",
             headers=headers
         )
-        
-        if response.status_code == 200:
-            # Cache successful response for 1 hour
-            await redis.setex(cache_key, 3600, response.content)
-            
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            media_type=response.headers.get("Content-Type"),
-            headers={"X-Cache": "MISS"}
+        return response.status_code, response.content
+    
+    try:
+        # Concurrent misses share a single upstream fetch; stale details are served
+        # while they are refreshed, and result ingestion invalidates changed parcels
+        return await cache.respond(
+            fetch_property,
+            key=property_cache_key(parcel_id),
+            transform=lambda content: project_fields(content, auth.tier),
+            variant=f"{auth.tier.value}-{field_set_version(auth.tier)}"
         )
     except Exception as e:
         logger.error("proxy_property_failed", parcel_id=parcel_id, error=str(e))
         raise HTTPException(status_code=502, detail="Upstream service error")
 
 @router.get("/properties")
-async def search_properties(request: Request):
+async def search_properties(
+    request: Request,
+    cache = Depends(response_cache("search_properties", SEARCH_CACHE_POLICY))
+):
     """
     Proxy request to Parser Service for property search.
     """
-    auth = request.state.auth
-    headers = {
-        "X-User-ID": auth.user_id or "anonymous",
-        "X-User-Tier": auth.tier.value
-    }
+    # Cached for every caller of the tier, so fetched as the gateway
+    headers = cache.upstream_headers()
     
-    try:
+    async def fetch():
         response = await parser_client.request(
             "GET", 
             "/api/v1/properties",
-            params=dict(request.query_params),
+            params=cache.params,
             headers=headers
         )
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            media_type=response.headers.get("Content-Type")
-        )
+        return response.status_code, response.content
+    
+    try:
+        return await cache.respond(fetch)
     except Exception as e:
         logger.error("proxy_search_failed", error=str(e))
         raise HTTPException(status_code=502, detail="Upstream service error")
@@ -1,41 +1,39 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from starlette.responses import Response
 import structlog
 from app.services.http_client import ServiceClient
 from app.core.config import settings
 from app.core.authorization import enforce_tier
+from app.core.response_cache import response_cache
+from app.services.cache import SEARCH_CACHE_POLICY
 
 logger = structlog.get_logger()
 router = APIRouter()
 
-parser_client = ServiceClient(settings.PARSER_SERVICE_URL, "parser")
+parser_client = ServiceClient(settings.PARSER_SERVICE_URL, "parser", hedge=True)
 
 @router.get("/address")
 async def search_by_address(
     request: Request,
-    _tier_check = Depends(enforce_tier("search"))
+    _tier_check = Depends(enforce_tier("search")),
+    cache = Depends(response_cache("search_address", SEARCH_CACHE_POLICY))
 ):
     """
     Proxy request to Parser Service for address search.
     """
-    auth = request.state.auth
-    headers = {
-        "X-User-ID": auth.user_id or "anonymous",
-        "X-User-Tier": auth.tier.value
-    }
+    # Cached for every caller of the tier, so fetched as the gateway
+    headers = cache.upstream_headers()
     
-    try:
+    async def fetch():
         response = await parser_client.request(
             "GET", 
             "/api/v1/search/address",
-            params=dict(request.query_params),
+            params=cache.params,
             headers=headers
         )
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            media_type=response.headers.get("Content-Type")
-        )
+        return response.status_code, response.content
+    
+    try:
+        return await cache.respond(fetch)
     except Exception as e:
         logger.error("proxy_search_address_failed", error=str(e))
         raise HTTPException(status_code=502, detail="Upstream service error")
@@ -43,29 +41,26 @@ async def search_by_address(
 @router.get("/owner")
 async def search_by_owner(
     request: Request,
-    _tier_check = Depends(enforce_tier("search"))
+    _tier_check = Depends(enforce_tier("search")),
+    cache = Depends(response_cache("search_owner", SEARCH_CACHE_POLICY))
 ):
     """
     Proxy request to Parser Service for owner search.
     """
-    auth = request.state.auth
-    headers = {
-        "X-User-ID": auth.user_id or "anonymous",
-        "X-User-Tier": auth.tier.value
-    }
+    # Cached for every caller of the tier, so fetched as the gateway
+    headers = cache.upstream_headers()
     
-    try:
+    async def fetch():
         response = await parser_client.request(
             "GET", 
             "/api/v1/search/owner",
-            params=dict(request.query_params),
+            params=cache.params,
             headers=headers
         )
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            media_type=response.headers.get("Content-Type")
-        )
+        return response.status_code, response.content
+    
+    try:
+        return await cache.respond(fetch)
     except Exception as e:
         logger.error("proxy_search_owner_failed", error=str(e))
         raise HTTPException(status_code=502, detail="Upstream service error")
@@ -1,42 +1,40 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
-from starlette.responses import Response
 import structlog
 from app.services.http_client import ServiceClient
 from app.core.config import settings
 from app.core.authorization import enforce_tier
+from app.core.response_cache import response_cache
+from app.services.cache import TOP_LIST_CACHE_POLICY
 
 logger = structlog.get_logger()
 router = APIRouter()
 
-ml_client = ServiceClient(settings.ML_SERVICE_URL, "ml")
+ml_client = ServiceClient(settings.ML_SERVICE_URL, "ml", hedge=True)
 
 @router.get("/{strategy}")
 async def get_top_list(
     strategy: str,
     request: Request,
-    _tier_check = Depends(enforce_tier("top_lists"))
+    _tier_check = Depends(enforce_tier("top_lists")),
+    cache = Depends(response_cache("top_list", TOP_LIST_CACHE_POLICY))
 ):
     """
     Proxy request to ML Service for top lists based on strategy.
     """
-    auth = request.state.auth
-    headers = {
-        "X-User-ID": auth.user_id or "anonymous",
-        "X-User-Tier": auth.tier.value
-    }
+    # Cached for every caller of the tier, so fetched as the gateway
+    headers = cache.upstream_headers()
     
-    try:
+    async def fetch():
         response = await ml_client.request(
             "GET", 
             f"/api/v1/top-lists/{strategy}",
-            params=dict(request.query_params),
+            params=cache.params,
             headers=headers
         )
-        return Response(
-            content=response.content,
-            status_code=response.status_code,
-            media_type=response.headers.get("Content-Type")
-        )
+        return response.status_code, response.content
+    
+    try:
+        return await cache.respond(fetch, identifier=strategy)
     except Exception as e:
         logger.error("proxy_top_lists_failed", strategy=strategy, error=str(e))
         raise HTTPException(status_code=502, detail="Upstream ML service error")
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 from fastapi import Request
@@ -17,6 +17,42 @@ REQUEST_LATENCY = Histogram(
     ["method", "endpoint"]
 )
 
+TASKS_REQUEUED = Counter(
+    "gateway_tasks_requeued_total",
+    "Number of tasks put back on their queue",
+    ["reason"]
+)
+
+PARCELS_UPSERTED = Counter(
+    "gateway_parcels_upserted_total",
+    "Number of parcel results written, by whether the parcel was new, changed or unchanged",
+    ["platform", "county", "outcome"]
+)
+
+CACHE_REQUESTS = Counter(
+    "gateway_cache_requests_total",
+    "Number of cached proxy reads, by route and whether they were served fresh, stale or fetched",
+    ["route", "result"]
+)
+
+CACHE_COMPRESSION_RATIO = Histogram(
+    "gateway_cache_compression_ratio",
+    "Size of cache values before compression divided by the size stored in Redis",
+    buckets=(1, 1.5, 2, 3, 4, 6, 8, 12, 16, 24)
+)
+
+UPSTREAM_RETRIES = Counter(
+    "gateway_upstream_retries_total",
+    "Extra upstream attempts: retries, hedged requests, and retries refused by the retry budget",
+    ["service", "kind"]
+)
+
+CIRCUIT_BREAKER_STATE = Gauge(
+    "gateway_circuit_breaker_state",
+    "Circuit breaker state per upstream service: 0 closed, 1 half-open, 2 open",
+    ["service"]
+)
+
 class PrometheusMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         method = request.method
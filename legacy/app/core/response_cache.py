@@ -0,0 +1,93 @@
+from fastapi import Request, Depends
+from starlette.responses import Response
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+from app.core.metrics import CACHE_REQUESTS
+from app.core.redis import get_redis
+from app.models.auth import UserTier
+from app.services.cache import CacheService, CachePolicy, Uncacheable
+
+# User the upstream fetch of a cached route is made as. Entries are shared by
+# every caller of a tier, so they must not depend on whoever filled them.
+CACHED_FETCH_USER_ID = "gateway"
+
+class ResponseCache:
+    """
+    Serves a proxy route's upstream responses through CacheService.get_response,
+    keyed by the caller's tier and the normalized query parameters.
+    Successful responses carry the ETag stored with the entry and a matching
+    If-None-Match is answered with 304.
+    """
+    def __init__(self, cache: CacheService, route: str, policy: CachePolicy, request: Request):
+        self.cache = cache
+        self.route = route
+        self.policy = policy
+        self.tier = request.state.auth.tier
+        self.params = self._normalize(request)
+        self.if_none_match = request.headers.get("if-none-match")
+
+    def _normalize(self, request: Request) -> Dict[str, str]:
+        # Same query, same key: order, padding and empty parameters do not matter
+        params = {key: value.strip() for key, value in request.query_params.items()}
+        return {key: value for key, value in params.items() if value}
+
+    def key(self, identifier: str = "") -> str:
+        return self.cache._generate_key(self.route, f"{identifier}:{self.tier.value}", self.params)
+
+    def upstream_headers(self, tier: Optional[UserTier] = None) -> Dict[str, str]:
+        """
+        Identity headers for the upstream fetch: the gateway, with the caller's
+        tier unless another one is given.
+        """
+        return {"X-User-ID": CACHED_FETCH_USER_ID, "X-User-Tier": (tier or self.tier).value}
+
+    async def respond(
+        self,
+        loader: Callable[[], Awaitable[Tuple[int, Union[str, bytes]]]],
+        identifier: str = "",
+        key: Optional[str] = None,
+        transform: Optional[Callable[[Union[str, bytes]], Union[str, bytes]]] = None,
+        variant: Optional[str] = None
+    ) -> Response:
+        """
+        Return the cached response, or the one produced by `loader` as (status_code, content).
+        `transform` is applied to successful content on the way out, after caching;
+        `variant` names what it depends on so each variant gets its own ETag.
+        Errors other than upstream responses propagate to the route.
+        """
+        try:
+            cached, cache_status = await self.cache.get_response(key or self.key(identifier), loader, self.policy)
+        except Uncacheable as e:
+            # Upstream errors and non-UTF-8 bodies go to every coalesced caller but are not cached
+            cached, cache_status = e.result, "MISS"
+
+        CACHE_REQUESTS.labels(route=self.route, result=cache_status.lower()).inc()
+        headers = {"X-Cache": cache_status}
+        content = cached.content
+        if cached.status_code == 200 and cached.etag:
+            etag = f'{cached.etag[:-1]}-{variant}"' if variant else cached.etag
+            headers["ETag"] = etag
+            # Decided before the body is transformed, so 304s cost no serialization
+            if self._etag_matches(etag):
+                return Response(status_code=304, headers=headers)
+        if transform and cached.status_code == 200:
+            content = transform(content)
+        return Response(
+            content=content,
+            status_code=cached.status_code,
+            media_type="application/json",
+            headers=headers
+        )
+
+    def _etag_matches(self, etag: str) -> bool:
+        if not self.if_none_match:
+            return False
+        if self.if_none_match.strip() == "*":
+            return True
+        # If-None-Match uses weak comparison
+        candidates = [tag.strip() for tag in self.if_none_match.split(",")]
+        return etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def response_cache(route: str, policy: CachePolicy):
+    async def dependency(request: Request, redis = Depends(get_redis)) -> ResponseCache:
+        return ResponseCache(CacheService(redis), route, policy, request)
+    return dependency
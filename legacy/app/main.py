@@ -6,6 +6,11 @@ from app.core.logging import setup_logging
 from app.core.redis import redis_manager
 from app.core.db import db_manager
 from app.core.auth import init_firebase
+from app.services.queue_maintenance import run_lease_reaper, run_retry_promoter
+from app.services.queue_notifier import queue_notifier
+from app.services.cache import cache_invalidation_listener
+from app.services.http_client import http_clients, ServiceClient, CIRCUIT_BREAKER_BACKEND
+from app.services.ingest import run_ingest_writer, INGEST_WRITERS
 from app.apps.public import create_public_app
 from app.apps.parcel_internal import create_parcel_internal_app
 from app.apps.party_internal import create_party_internal_app
@@ -21,6 +26,31 @@ async def run_servers():
     await redis_manager.connect()
     init_firebase()
     
+    # Pooled keep-alive connections to upstream services
+    http_clients.open(settings.PARSER_SERVICE_URL, settings.ML_SERVICE_URL, settings.PROXY_SERVICE_URL)
+    
+    # Trip upstream circuit breakers for every gateway process at once
+    if CIRCUIT_BREAKER_BACKEND == "redis":
+        ServiceClient.share_breakers(redis_manager.redis)
+    
+    # Wake-ups for long-polling workers
+    await queue_notifier.start(redis_manager.redis)
+    
+    # Keeps the in-process property cache coherent across gateway processes
+    await cache_invalidation_listener.start(redis_manager.redis)
+    
+    # Background maintenance
+    background_tasks = [
+        asyncio.create_task(run_lease_reaper(redis_manager.redis)),
+        asyncio.create_task(run_retry_promoter(redis_manager.redis)),
+    ]
+    
+    # Write-behind persistence of results submitted with mode=async
+    background_tasks += [
+        asyncio.create_task(run_ingest_writer(redis_manager.redis, name=str(i)))
+        for i in range(INGEST_WRITERS)
+    ]
+    
     # Create all FastAPI applications
     public_app = create_public_app()
     parcel_internal_app = create_parcel_internal_app()
@@ -65,7 +95,14 @@ async def run_servers():
     except Exception as e:
         logger.error("servers_failed", error=str(e))
     finally:
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        await queue_notifier.stop()
+        await cache_invalidation_listener.stop()
+        
         # Cleanup shared resources
+        await http_clients.close()
         await redis_manager.disconnect()
         await db_manager.disconnect()
         logger.info("servers_stopped")
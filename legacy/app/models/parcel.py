@@ -13,6 +13,7 @@ class Parcel(Base):
     data = Column(JSON, nullable=False)
     scraped_at = Column(DateTime, default=datetime.utcnow)
     worker_id = Column(String, nullable=True)
+    content_hash = Column(String, nullable=True)
 
     __table_args__ = (
         UniqueConstraint('parcel_id', 'platform', 'state', 'county', name='_parcel_platform_uc'),
@@ -19,10 +19,32 @@ class WorkTask(BaseModel):
     proxy: Optional[ProxyInfo] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class EnqueueResponse(BaseModel):
+    queued: int
+    duplicates: int
+
 class WorkResponse(BaseModel):
     tasks: List[WorkTask]
     retry_after: int = 30
 
+class TaskFailReport(BaseModel):
+    error: Optional[str] = None
+
+class TaskFailResponse(BaseModel):
+    status: str  # retry_scheduled, dead_lettered, not_found
+    attempts: int = 0
+    retry_in: int = 0
+
+class DeadLetter(BaseModel):
+    task: WorkTask
+    error: Optional[str] = None
+    attempts: int
+    failed_at: datetime
+
+class DeadLetterList(BaseModel):
+    total: int
+    tasks: List[DeadLetter]
+
 class ParcelResult(BaseModel):
     task_id: str
     parcel_id: str
@@ -39,6 +61,8 @@ class SubmitResponse(BaseModel):
     updated: int
     failed: int
     errors: List[str] = []
+    unchanged: int = 0  # content identical to what is stored, nothing written
+    queued: int = 0  # accepted for write-behind ingestion, not yet persisted
 
 class WorkerStatus(BaseModel):
     active_tasks: int
@@ -1,32 +1,509 @@
 from redis.asyncio import Redis
+import asyncio
+import base64
 import json
 import hashlib
+import time
+import uuid
+import zlib
 import structlog
-from typing import Optional, Any
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Any, Awaitable, Callable, Dict, Iterable, List, Tuple, Union
+from app.core.metrics import CACHE_COMPRESSION_RATIO
 from app.core.redis import get_redis
+from app.models.auth import UserTier
 
 logger = structlog.get_logger()
 
+# Property details are invalidated when a parcel is written, so they can live for days
+PROPERTY_CACHE_TTL = 7 * 24 * 3600
+
+# Parcel ids whose cached details were dropped, as a JSON list
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+# A reader that fetched the old details just before the write may still cache them;
+# invalidations are repeated once after this delay to catch it
+INVALIDATION_REPEAT_SECONDS = 2.0
+
+# Keys per UNLINK command
+INVALIDATION_CHUNK_SIZE = 1000
+
+# In-process tier in front of Redis. Entries are dropped on invalidation messages;
+# the short TTL bounds staleness if one is missed while resubscribing.
+LOCAL_CACHE_MAX_ENTRIES = 10000
+LOCAL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+LOCAL_CACHE_TTL = 60.0
+
+# Only one process fetches a missing key from upstream; the others wait this long
+# for it to be cached before fetching it themselves
+FILL_LOCK_TTL_MS = 10000
+FILL_LOCK_WAIT_SECONDS = 5.0
+FILL_LOCK_POLL_SECONDS = 0.05
+
+# Deletes the fill lock only if we still hold it
+RELEASE_FILL_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Values at least this large are stored deflated. The client decodes responses,
+# so compressed values are base64 text behind a marker no JSON value starts with;
+# values without it are read as they are.
+COMPRESSION_MIN_BYTES = 1024
+COMPRESSION_LEVEL = 6
+COMPRESSED_MARKER = "\x1fz"
+
+_pending_invalidations = set()
+
+def property_cache_key(parcel_id: str) -> str:
+    # One canonical payload per parcel; tiers see projections of it
+    return f"cache:prop:{parcel_id}"
+
+def property_cache_keys(parcel_ids: Iterable[str]) -> List[str]:
+    keys = []
+    for parcel_id in parcel_ids:
+        keys.append(property_cache_key(parcel_id))
+        # Per-tier entries cached before payloads were shared, until they expire
+        keys.extend(f"cache:prop:{parcel_id}:{tier.value}" for tier in UserTier)
+    return keys
+
+def compress_value(value: Union[str, bytes]) -> Union[str, bytes]:
+    raw = value.encode() if isinstance(value, str) else value
+    if len(raw) < COMPRESSION_MIN_BYTES:
+        return value
+    compressed = COMPRESSED_MARKER + base64.b64encode(zlib.compress(raw, COMPRESSION_LEVEL)).decode()
+    if len(compressed) >= len(raw):
+        return value
+    CACHE_COMPRESSION_RATIO.observe(len(raw) / len(compressed))
+    return compressed
+
+def decompress_value(data: Union[str, bytes]) -> Union[str, bytes]:
+    marker = COMPRESSED_MARKER.encode() if isinstance(data, bytes) else COMPRESSED_MARKER
+    if not data.startswith(marker):
+        return data
+    return zlib.decompress(base64.b64decode(data[len(marker):])).decode()
+
+class LocalCache:
+    """
+    Bounded LRU of raw cached values with per-entry expiry.
+    Evicts least recently used entries once either the entry or the byte limit is exceeded.
+    """
+    def __init__(
+        self,
+        max_entries: int = LOCAL_CACHE_MAX_ENTRIES,
+        max_bytes: int = LOCAL_CACHE_MAX_BYTES,
+        ttl: float = LOCAL_CACHE_TTL
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[str, Tuple[Union[str, bytes], float, int]]" = OrderedDict()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, _ = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Union[str, bytes], ttl: Optional[float] = None):
+        self.delete(key)
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def delete(self, *keys: str):
+        for key in keys:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+local_cache = LocalCache()
+
+class Uncacheable(Exception):
+    """
+    Raised while filling a response for a result that is handed to every
+    waiting caller but not cached, e.g. an upstream error response.
+    """
+    def __init__(self, result: Any):
+        super().__init__(result)
+        self.result = result
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    How long a proxied response is cached. Responses are served as fresh for
+    soft_ttl, then served stale while refreshed in the background until hard_ttl.
+    404s are cached for negative_ttl; 0 disables negative caching.
+    """
+    soft_ttl: int
+    hard_ttl: int
+    negative_ttl: int = 0
+
+# Property details are also invalidated on write, so the soft TTL only bounds
+# drift from changes made outside result ingestion
+PROPERTY_CACHE_POLICY = CachePolicy(soft_ttl=3600, hard_ttl=PROPERTY_CACHE_TTL, negative_ttl=60)
+
+# Search results are not invalidated when parcels change, so keep them short-lived
+SEARCH_CACHE_POLICY = CachePolicy(soft_ttl=60, hard_ttl=600)
+
+# Top lists are the same for every user of a tier and costly to compute
+TOP_LIST_CACHE_POLICY = CachePolicy(soft_ttl=300, hard_ttl=3600)
+
+# Prefix of cached responses: status code, fresh-until timestamp and ETag, then the body
+CACHED_RESPONSE_MARKER = "\x1e"
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    content: Union[str, bytes]
+    fresh_until: float
+    etag: Optional[str] = None
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+def compute_etag(content: Union[str, bytes]) -> str:
+    if isinstance(content, str):
+        content = content.encode()
+    return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+def encode_cached_response(status_code: int, content: Union[str, bytes], fresh_until: float) -> str:
+    if isinstance(content, bytes):
+        content = content.decode()
+    header = f"{CACHED_RESPONSE_MARKER}{status_code} {fresh_until:.3f}"
+    if status_code == 200:
+        header += f" {compute_etag(content)}"
+    return f"{header}\n{content}"
+
+def decode_cached_response(data: Union[str, bytes]) -> CachedResponse:
+    if isinstance(data, bytes):
+        data = data.decode()
+    if not data.startswith(CACHED_RESPONSE_MARKER):
+        # Bare bodies cached before responses carried metadata
+        return CachedResponse(200, data, float("inf"), compute_etag(data))
+    header, _, content = data.partition("\n")
+    status_code, fresh_until, *etag = header[len(CACHED_RESPONSE_MARKER):].split(" ")
+    status_code = int(status_code)
+    if etag:
+        etag = etag[0]
+    elif status_code == 200:
+        # Cached before ETags were stored with the response
+        etag = compute_etag(content)
+    else:
+        etag = None
+    return CachedResponse(status_code, content, float(fresh_until), etag)
+
+def _log_refresh_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception():
+        logger.warning("cache_refresh_failed", error=str(task.exception()))
+
+# cache key -> upstream fetch in flight in this process
+_fills: Dict[str, asyncio.Task] = {}
+
 class CacheService:
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, local: Optional[LocalCache] = local_cache):
         self.redis = redis
+        self.local = local
 
     def _generate_key(self, prefix: str, identifier: str, params: Optional[dict] = None) -> str:
         param_str = json.dumps(params, sort_keys=True) if params else ""
         param_hash = hashlib.md5(param_str.encode()).hexdigest() if param_str else "raw"
         return f"cache:{prefix}:{identifier}:{param_hash}"
 
-    async def get(self, key: str) -> Optional[dict]:
+    async def get_raw(self, key: str, use_local: bool = True) -> Optional[Union[str, bytes]]:
+        """
+        Read the stored value of `key`, from the local tier when it holds it
+        and `use_local` is set. The local tier keeps values decompressed so hits
+        stay cheap; a Redis read refreshes it.
+        """
+        if use_local and self.local is not None:
+            data = self.local.get(key)
+            if data is not None:
+                return data
+
         data = await self.redis.get(key)
+        if data:
+            data = decompress_value(data)
+            if self.local is not None:
+                self.local.set(key, data)
+        return data
+
+    async def set_raw(self, key: str, value: Union[str, bytes], ttl: int = 3600):
+        await self.redis.setex(key, ttl, compress_value(value))
+        if self.local is not None:
+            self.local.set(key, value, ttl)
+
+    async def get_response(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Tuple[int, Union[str, bytes]]]],
+        policy: CachePolicy,
+        distributed: bool = True
+    ) -> Tuple[CachedResponse, str]:
+        """
+        Read a cached upstream response, or fill it with the (status_code, content)
+        returned by `loader`. Responses past their soft TTL are served while a
+        background refresh replaces them. Returns (response, "HIT" | "STALE" | "MISS").
+        """
+        data = await self.get_raw(key)
+        if data is not None:
+            cached = decode_cached_response(data)
+            if not cached.is_fresh() and self.local is not None:
+                # The local copy may predate a refresh another process already stored
+                shared = await self.get_raw(key, use_local=False)
+                if shared is not None:
+                    cached = decode_cached_response(shared)
+            if cached.is_fresh():
+                return cached, "HIT"
+            self._refresh(key, loader, policy, distributed)
+            return cached, "STALE"
+
+        async def load():
+            return await self._load_response(key, loader, policy)
+
+        is_filled = lambda data: data is not None
+        data = await self._coalesce(key, load, is_filled, distributed)
+        return decode_cached_response(data), "MISS"
+
+    def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Tuple[int, Union[str, bytes]]]],
+        policy: CachePolicy,
+        distributed: bool
+    ):
+        refresh_key = f"refresh:{key}"
+        if refresh_key in _fills:
+            return
+
+        async def load():
+            return await self._load_response(key, loader, policy)
+
+        # Another process refreshing it counts as done; nobody waits on a refresh
+        is_fresh = lambda data: data is not None and decode_cached_response(data).is_fresh()
+        task = self._start_fill(refresh_key, key, load, is_fresh, distributed, wait=False)
+        task.add_done_callback(_log_refresh_failure)
+
+    async def _load_response(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Tuple[int, Union[str, bytes]]]],
+        policy: CachePolicy
+    ) -> str:
+        status_code, content = await loader()
+        if status_code == 404 and policy.negative_ttl:
+            fresh_for, ttl = policy.negative_ttl, policy.negative_ttl
+        elif status_code == 200:
+            fresh_for, ttl = policy.soft_ttl, policy.hard_ttl
+        else:
+            raise Uncacheable(CachedResponse(status_code, content, 0))
+
+        if isinstance(content, bytes):
+            try:
+                content = content.decode()
+            except UnicodeDecodeError:
+                # Cached responses are stored as text; pass other bodies through as they are
+                logger.warning("cache_body_not_utf8", key=key, status_code=status_code)
+                raise Uncacheable(CachedResponse(status_code, content, 0))
+
+        data = encode_cached_response(status_code, content, time.time() + fresh_for)
+        await self.set_raw(key, data, ttl)
+        return data
+
+    async def _coalesce(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        is_filled: Callable[[Any], bool],
+        distributed: bool
+    ) -> Any:
+        fill = _fills.get(key)
+        if fill is None:
+            fill = self._start_fill(key, key, load, is_filled, distributed, wait=True)
+        # The fill outlives a cancelled caller so the other waiters still get it
+        return await asyncio.shield(fill)
+
+    def _start_fill(
+        self,
+        fill_key: str,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        is_filled: Callable[[Any], bool],
+        distributed: bool,
+        wait: bool
+    ) -> asyncio.Task:
+        fill = asyncio.create_task(self._fill(key, load, is_filled, distributed, wait))
+        _fills[fill_key] = fill
+        fill.add_done_callback(lambda _: _fills.pop(fill_key, None))
+        return fill
+
+    async def _fill(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        is_filled: Callable[[Any], bool],
+        distributed: bool,
+        wait: bool
+    ) -> Any:
+        if not distributed:
+            return await load()
+
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, px=FILL_LOCK_TTL_MS):
+            if not wait:
+                return None
+            data = await self._wait_for_fill(key, lock_key, is_filled)
+            if data is not None:
+                return data
+            return await load()
+
+        try:
+            # Another process may have filled it between our read and the lock;
+            # only Redis knows, the local tier may still hold the old copy
+            data = await self.get_raw(key, use_local=False)
+            if is_filled(data):
+                return data
+            return await load()
+        finally:
+            try:
+                await self.redis.eval(RELEASE_FILL_LOCK_LUA, 1, lock_key, token)
+            except Exception as e:
+                # It expires on its own
+                logger.warning("cache_fill_lock_release_failed", key=key, error=str(e))
+
+    async def _wait_for_fill(
+        self,
+        key: str,
+        lock_key: str,
+        is_filled: Callable[[Any], bool]
+    ) -> Optional[Union[str, bytes]]:
+        deadline = time.monotonic() + FILL_LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(FILL_LOCK_POLL_SECONDS)
+            data = await self.get_raw(key, use_local=False)
+            if is_filled(data):
+                return data
+            # Released without caching anything
+            if not await self.redis.exists(lock_key):
+                return None
+        logger.warning("cache_fill_wait_timeout", key=key)
+        return None
+
+    async def get(self, key: str) -> Optional[dict]:
+        data = await self.get_raw(key)
         if data:
             logger.info("cache_hit", key=key)
             return json.loads(data)
         return None
 
     async def set(self, key: str, value: Any, ttl: int = 3600):
-        await self.redis.setex(key, ttl, json.dumps(value))
+        await self.set_raw(key, json.dumps(value), ttl)
         logger.info("cache_set", key=key, ttl=ttl)
 
+    async def invalidate_properties(self, parcel_ids: Iterable[str]):
+        """
+        Drop the cached details of parcels and announce it on
+        CACHE_INVALIDATION_CHANNEL for in-process caches.
+        """
+        parcel_ids = sorted(set(parcel_ids))
+        if not parcel_ids:
+            return
+
+        if self.local is not None:
+            self.local.delete(*property_cache_keys(parcel_ids))
+        await self._unlink_properties(parcel_ids)
+        await self.redis.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(parcel_ids))
+        logger.info("cache_invalidated", count=len(parcel_ids))
+
+        task = asyncio.create_task(self._repeat_invalidation(parcel_ids))
+        _pending_invalidations.add(task)
+        task.add_done_callback(_pending_invalidations.discard)
+
+    async def _unlink_properties(self, parcel_ids: List[str]):
+        keys = property_cache_keys(parcel_ids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for start in range(0, len(keys), INVALIDATION_CHUNK_SIZE):
+                pipe.unlink(*keys[start:start + INVALIDATION_CHUNK_SIZE])
+            await pipe.execute()
+
+    async def _repeat_invalidation(self, parcel_ids: List[str]):
+        await asyncio.sleep(INVALIDATION_REPEAT_SECONDS)
+        try:
+            await self._unlink_properties(parcel_ids)
+            await self.redis.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(parcel_ids))
+        except Exception as e:
+            logger.warning("cache_invalidation_repeat_failed", count=len(parcel_ids), error=str(e))
+
+class CacheInvalidationListener:
+    """
+    Keeps the local tier of this process coherent with other gateway processes
+    by evicting parcels announced on CACHE_INVALIDATION_CHANNEL.
+    """
+    def __init__(self, local: LocalCache):
+        self.local = local
+        self._listener: Optional[asyncio.Task] = None
+
+    def handle(self, data: str):
+        self.local.delete(*property_cache_keys(json.loads(data)))
+
+    async def start(self, redis: Redis):
+        self._listener = asyncio.create_task(self._listen(redis))
+        logger.info("cache_invalidation_listener_started", channel=CACHE_INVALIDATION_CHANNEL)
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def _listen(self, redis: Redis):
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # Invalidations published while we were not subscribed are lost
+                self.local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.handle(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("cache_invalidation_listener_failed", error=str(e))
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+cache_invalidation_listener = CacheInvalidationListener(local_cache)
+
 async def get_cache_service() -> CacheService:
     redis = await get_redis()
     return CacheService(redis)
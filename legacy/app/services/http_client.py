@@ -1,17 +1,156 @@
 import httpx
+import importlib.util
+import os
+import random
 import time
 import asyncio
 import structlog
-from typing import Dict, Any, Optional
+from collections import deque
+from redis.asyncio import Redis
+from typing import Awaitable, Callable, Dict, Any, Optional
 from enum import Enum
+from app.core.metrics import UPSTREAM_RETRIES, CIRCUIT_BREAKER_STATE
 
 logger = structlog.get_logger()
 
+# Connection pool of each upstream service, shared by all requests to it
+HTTP_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+HTTP2_ENABLED = os.getenv("UPSTREAM_HTTP2", "false").lower() == "true"
+
+class HTTPClientManager:
+    """
+    Long-lived httpx clients, one per upstream base URL, so requests reuse
+    kept-alive connections instead of opening a new one each time.
+    """
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def get(self, base_url: str) -> httpx.AsyncClient:
+        client = self._clients.get(base_url)
+        if client is None or client.is_closed:
+            client = self._create(base_url)
+            self._clients[base_url] = client
+        return client
+
+    def _create(self, base_url: str) -> httpx.AsyncClient:
+        http2 = HTTP2_ENABLED
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("http2_unavailable", base_url=base_url)
+            http2 = False
+        return httpx.AsyncClient(
+            base_url=base_url,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+
+    def open(self, *base_urls: str):
+        for base_url in base_urls:
+            self.get(base_url)
+        logger.info("http_clients_opened", count=len(self._clients), http2=HTTP2_ENABLED)
+
+    async def close(self):
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*[client.aclose() for client in clients], return_exceptions=True)
+        logger.info("http_clients_closed", count=len(clients))
+
+http_clients = HTTPClientManager()
+
+# Only these are retried or hedged; sending them twice has no extra effect
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUS_CODES = {502, 503, 504}
+MAX_ATTEMPTS = 3
+
+# Full-jitter exponential backoff between attempts
+RETRY_BACKOFF_BASE = 0.05
+RETRY_BACKOFF_MAX = 1.0
+
+# Retries and hedges of a service may add this fraction of its request rate,
+# plus a small floor so a quiet service can still retry
+RETRY_BUDGET_RATIO = 0.1
+RETRY_BUDGET_MIN_PER_SECOND = 1.0
+RETRY_BUDGET_MAX_TOKENS = 10.0
+
+# A hedged GET sends a second request once the first has taken longer than
+# this percentile of recent latencies
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_DELAY = 0.01
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+class RetryBudget:
+    """
+    Token bucket bounding extra attempts, so retries cannot multiply the load
+    on an upstream that is already failing.
+    """
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+        max_tokens: float = RETRY_BUDGET_MAX_TOKENS
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + amount + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class LatencyTracker:
+    """
+    Recent successful request latencies of a service.
+    """
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def retry_backoff(attempt: int) -> float:
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+
 class CircuitState(Enum):
     CLOSED = "closed"
     OPEN = "open"
     HALF_OPEN = "half_open"
 
+# "local" (default) keeps breaker state per process, "redis" shares it between all gateway processes
+CIRCUIT_BREAKER_BACKEND = os.getenv("CIRCUIT_BREAKER_BACKEND", "local")
+
+# Gauge values of gateway_circuit_breaker_state
+BREAKER_STATE_VALUES = {
+    CircuitState.CLOSED: 0,
+    CircuitState.HALF_OPEN: 1,
+    CircuitState.OPEN: 2,
+}
+
 class CircuitBreaker:
     def __init__(self, name: str, threshold: int = 5, recovery_timeout: int = 30):
         self.name = name
@@ -21,15 +160,19 @@ class CircuitBreaker:
         self.failures = 0
         self.last_failure_time = 0
 
+    def _set_state(self, state: CircuitState):
+        self.state = state
+        CIRCUIT_BREAKER_STATE.labels(service=self.name).set(BREAKER_STATE_VALUES[state])
+
     def record_success(self):
         self.failures = 0
-        self.state = CircuitState.CLOSED
+        self._set_state(CircuitState.CLOSED)
 
     def record_failure(self):
         self.failures += 1
         self.last_failure_time = time.time()
         if self.failures >= self.threshold:
-            self.state = CircuitState.OPEN
+            self._set_state(CircuitState.OPEN)
             logger.error("circuit_breaker_opened", service=self.name, failures=self.failures)
 
     def can_execute(self) -> bool:
@@ -38,22 +181,202 @@ class CircuitBreaker:
         
         if self.state == CircuitState.OPEN:
             if time.time() - self.last_failure_time > self.recovery_timeout:
-                self.state = CircuitState.HALF_OPEN
+                self._set_state(CircuitState.HALF_OPEN)
                 logger.info("circuit_breaker_half_open", service=self.name)
                 return True
             return False
         
         return True # HALF_OPEN
 
+    async def allow(self) -> bool:
+        return self.can_execute()
+
+    async def record(self, success: bool):
+        if success:
+            self.record_success()
+        else:
+            self.record_failure()
+
+# Decides whether a request may go ahead. Once the open period is over, exactly
+# one caller gets the half-open probe; a probe that never reports back is
+# handed to someone else after ARGV[3] seconds.
+# Returns the state and whether the caller may proceed.
+BREAKER_ALLOW_LUA = """
+local now = tonumber(ARGV[1])
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+if state == 'closed' then
+    return {state, 1}
+end
+
+if state == 'open' then
+    local opened_at = tonumber(redis.call('HGET', KEYS[1], 'opened_at') or '0')
+    if now - opened_at < tonumber(ARGV[2]) then
+        return {state, 0}
+    end
+    redis.call('HSET', KEYS[1], 'state', 'half_open', 'probe_at', now)
+    return {'half_open', 1}
+end
+
+local probe_at = tonumber(redis.call('HGET', KEYS[1], 'probe_at') or '0')
+if now - probe_at < tonumber(ARGV[3]) then
+    return {state, 0}
+end
+redis.call('HSET', KEYS[1], 'probe_at', now)
+return {state, 1}
+"""
+
+# Records an outcome. The probe's outcome closes or re-opens the breaker;
+# otherwise outcomes are counted in one-second buckets and the breaker opens
+# once the error rate over the window reaches ARGV[5] with at least ARGV[4] requests.
+# Returns the new state.
+BREAKER_RECORD_LUA = """
+local now = tonumber(ARGV[1])
+local success = ARGV[2] == '1'
+local window = tonumber(ARGV[3])
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+
+if state == 'half_open' then
+    if success then
+        redis.call('DEL', KEYS[1], KEYS[2])
+        return 'closed'
+    end
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', now)
+    return 'open'
+end
+if state == 'open' then
+    return state
+end
+
+local bucket = math.floor(now)
+redis.call('HINCRBY', KEYS[2], bucket .. (success and ':ok' or ':fail'), 1)
+redis.call('EXPIRE', KEYS[2], window * 2)
+
+local total = 0
+local failures = 0
+local counts = redis.call('HGETALL', KEYS[2])
+for i = 1, #counts, 2 do
+    local second, outcome = string.match(counts[i], '(%d+):(%a+)')
+    if tonumber(second) <= bucket - window then
+        redis.call('HDEL', KEYS[2], counts[i])
+    else
+        local count = tonumber(counts[i + 1])
+        total = total + count
+        if outcome == 'fail' then
+            failures = failures + count
+        end
+    end
+end
+
+if total >= tonumber(ARGV[4]) and failures / total >= tonumber(ARGV[5]) then
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', now)
+    redis.call('DEL', KEYS[2])
+    return 'open'
+end
+return state
+"""
+
+class RedisCircuitBreaker(CircuitBreaker):
+    """
+    Circuit breaker whose state lives in Redis, so every gateway process stops
+    calling a failing service as soon as one of them trips the breaker.
+    Opens on the error rate over a sliding window rather than consecutive failures.
+    If Redis is unreachable requests are let through.
+    """
+    def __init__(
+        self,
+        name: str,
+        redis: Redis,
+        window_seconds: int = 30,
+        min_requests: int = 10,
+        error_rate: float = 0.5,
+        recovery_timeout: int = 30,
+        probe_timeout: int = 30,
+        state_cache_seconds: float = 1.0
+    ):
+        super().__init__(name, recovery_timeout=recovery_timeout)
+        self.redis = redis
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.probe_timeout = probe_timeout
+        # While closed, allow() trusts the state seen this recently instead of asking Redis
+        self.state_cache_seconds = state_cache_seconds
+        self.state_seen_at = 0.0
+        self.state_key = f"breaker:{name}"
+        self.window_key = f"breaker:{name}:window"
+        self._allow_script = redis.register_script(BREAKER_ALLOW_LUA)
+        self._record_script = redis.register_script(BREAKER_RECORD_LUA)
+
+    def _observe(self, state: str):
+        previous = self.state
+        self._set_state(CircuitState(state))
+        self.state_seen_at = time.monotonic()
+        if self.state != previous:
+            logger.info("circuit_breaker_state_changed", service=self.name,
+                        previous=previous.value, state=self.state.value)
+
+    async def allow(self) -> bool:
+        if self.state == CircuitState.CLOSED and time.monotonic() - self.state_seen_at < self.state_cache_seconds:
+            return True
+        try:
+            state, allowed = await self._allow_script(
+                keys=[self.state_key],
+                args=[time.time(), self.recovery_timeout, self.probe_timeout]
+            )
+        except Exception as e:
+            logger.warning("circuit_breaker_unavailable", service=self.name, error=str(e))
+            return True
+        self._observe(state)
+        return bool(allowed)
+
+    async def record(self, success: bool):
+        try:
+            state = await self._record_script(
+                keys=[self.state_key, self.window_key],
+                args=[time.time(), int(success), self.window_seconds, self.min_requests, self.error_rate]
+            )
+        except Exception as e:
+            logger.warning("circuit_breaker_unavailable", service=self.name, error=str(e))
+            return
+        self._observe(state)
+        if self.state == CircuitState.OPEN and not success:
+            logger.error("circuit_breaker_opened", service=self.name)
+
 class ServiceClient:
     _breakers: Dict[str, CircuitBreaker] = {}
+    _budgets: Dict[str, RetryBudget] = {}
+    _latencies: Dict[str, LatencyTracker] = {}
+    _breaker_redis: Optional[Redis] = None
 
-    def __init__(self, base_url: str, service_name: str):
+    def __init__(self, base_url: str, service_name: str, hedge: bool = False):
         self.base_url = base_url
         self.service_name = service_name
+        self.hedge = hedge
         if service_name not in self._breakers:
-            self._breakers[service_name] = CircuitBreaker(service_name)
-        self.breaker = self._breakers[service_name]
+            self._breakers[service_name] = self._create_breaker(service_name)
+        self.budget = self._budgets.setdefault(service_name, RetryBudget())
+        self.latency = self._latencies.setdefault(service_name, LatencyTracker())
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breakers[self.service_name]
+
+    @classmethod
+    def _create_breaker(cls, service_name: str) -> CircuitBreaker:
+        if cls._breaker_redis is not None:
+            return RedisCircuitBreaker(service_name, cls._breaker_redis)
+        return CircuitBreaker(service_name)
+
+    @classmethod
+    def share_breakers(cls, redis: Redis):
+        """
+        Keep the breakers of every service in Redis from now on, including
+        those of clients created before this was called.
+        """
+        cls._breaker_redis = redis
+        for service_name in cls._breakers:
+            cls._breakers[service_name] = cls._create_breaker(service_name)
+        logger.info("circuit_breakers_shared", services=list(cls._breakers))
 
     async def request(
         self, 
@@ -64,27 +387,100 @@ class ServiceClient:
         headers: Optional[Dict] = None,
         timeout: float = 30.0
     ):
-        if not self.breaker.can_execute():
+        """
+        Send a request to the service. Idempotent requests are retried on connection
+        errors and gateway errors while the retry budget allows, and GETs are hedged
+        when enabled. The circuit breaker sees the outcome of the whole request.
+        """
+        breaker = self.breaker
+        if not await breaker.allow():
             logger.warning("circuit_breaker_blocked_request", service=self.service_name)
             raise httpx.HTTPStatusError("Circuit breaker is OPEN", request=None, response=None)
 
-        async with httpx.AsyncClient(base_url=self.base_url) as client:
+        async def send():
+            return await self._send(method, path, params, json, headers, timeout)
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        hedged = self.hedge and method.upper() == "GET"
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            error = None
             try:
-                response = await client.request(
-                    method=method,
-                    url=path,
-                    params=params,
-                    json=json,
-                    headers=headers,
-                    timeout=timeout
-                )
-                
-                if response.status_code >= 500:
-                    self.breaker.record_failure()
-                else:
-                    self.breaker.record_success()
-                    
-                return response
-            except (httpx.RequestError, asyncio.TimeoutError):
-                self.breaker.record_failure()
-                raise
+                response = await (self._hedged(send) if hedged else send())
+                if not (idempotent and response.status_code in RETRY_STATUS_CODES):
+                    break
+            except (httpx.RequestError, asyncio.TimeoutError) as e:
+                if not idempotent:
+                    await breaker.record(False)
+                    raise
+                error = e
+
+            if attempt >= MAX_ATTEMPTS or not self.budget.withdraw():
+                if attempt < MAX_ATTEMPTS:
+                    UPSTREAM_RETRIES.labels(service=self.service_name, kind="budget_exhausted").inc()
+                if error:
+                    await breaker.record(False)
+                    raise error
+                break
+
+            UPSTREAM_RETRIES.labels(service=self.service_name, kind="retry").inc()
+            logger.info("upstream_retry", service=self.service_name, path=path, attempt=attempt,
+                        error=str(error) if error else None, status=None if error else response.status_code)
+            await asyncio.sleep(retry_backoff(attempt))
+
+        await breaker.record(response.status_code < 500)
+        return response
+
+    async def _send(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict],
+        json: Optional[Dict],
+        headers: Optional[Dict],
+        timeout: float
+    ) -> httpx.Response:
+        client = http_clients.get(self.base_url)
+        started = time.monotonic()
+        response = await client.request(
+            method=method,
+            url=path,
+            params=params,
+            json=json,
+            headers=headers,
+            timeout=timeout
+        )
+        if response.status_code < 500:
+            self.latency.record(time.monotonic() - started)
+        return response
+
+    async def _hedged(self, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """
+        Send a second request if the first is slower than the tail of recent
+        latencies, and take whichever answers first.
+        """
+        delay = self.latency.percentile(HEDGE_PERCENTILE)
+        first = asyncio.ensure_future(send())
+        if delay is None:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=max(delay, HEDGE_MIN_DELAY))
+        if done or not self.budget.withdraw():
+            return await first
+
+        UPSTREAM_RETRIES.labels(service=self.service_name, kind="hedge").inc()
+        pending = {first, asyncio.ensure_future(send())}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
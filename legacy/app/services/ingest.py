@@ -0,0 +1,139 @@
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+import asyncio
+import json
+import os
+import socket
+import structlog
+from typing import List, Tuple
+from app.core.db import db_manager
+from app.models.worker import ParcelResult
+from app.services.cache import CacheService
+from app.services.properties import PropertyService
+from app.services.queue_backend import get_worker_queue
+from app.services.results import complete_results
+
+logger = structlog.get_logger()
+
+# Submissions accepted in async mode wait here until a writer persists them
+INGEST_STREAM_KEY = "ingest:results"
+INGEST_GROUP = "writers"
+
+# A writer keeps reading submissions until it has this many rows to write at once
+INGEST_BATCH_ROWS = 5000
+INGEST_READ_COUNT = 100
+INGEST_BLOCK_MS = 1000
+
+# Writer tasks per gateway process
+INGEST_WRITERS = 2
+
+# Submissions a writer took but never acknowledged (crash, DB outage) are picked
+# up again once idle this long
+INGEST_CLAIM_IDLE_MS = 60000
+
+class ResultIngest:
+    """
+    Write-behind ingestion of worker results through a Redis stream.
+    Endpoints append submissions; writers coalesce them into large upserts,
+    then complete the tasks and acknowledge the entries.
+    """
+    def __init__(self, redis: Redis):
+        self.redis = redis
+
+    async def ensure_group(self):
+        try:
+            await self.redis.xgroup_create(INGEST_STREAM_KEY, INGEST_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def enqueue(self, results: List[ParcelResult], worker_id: str) -> str:
+        payload = json.dumps([res.model_dump(mode="json") for res in results])
+        entry_id = await self.redis.xadd(
+            INGEST_STREAM_KEY, {"worker_id": worker_id, "count": len(results), "results": payload}
+        )
+        logger.info("results_queued", worker_id=worker_id, count=len(results), entry_id=entry_id)
+        return entry_id
+
+    async def read_batch(self, consumer: str) -> Tuple[List[str], List[Tuple[ParcelResult, str]]]:
+        """
+        Collect submissions until INGEST_BATCH_ROWS rows are buffered or the stream is drained.
+        Returns the entry ids and their (result, worker_id) rows.
+        """
+        # Abandoned submissions first, so they are not starved by new ones
+        _, entries, *_ = await self.redis.xautoclaim(
+            INGEST_STREAM_KEY, INGEST_GROUP, consumer, INGEST_CLAIM_IDLE_MS, "0-0", count=INGEST_READ_COUNT
+        )
+        entries = list(entries)
+
+        row_count = sum(self._row_count(fields) for _, fields in entries)
+        while row_count < INGEST_BATCH_ROWS:
+            # Only block while there is nothing to write yet
+            response = await self.redis.xreadgroup(
+                INGEST_GROUP, consumer, {INGEST_STREAM_KEY: ">"},
+                count=INGEST_READ_COUNT, block=None if entries else INGEST_BLOCK_MS
+            )
+            if not response:
+                break
+            fresh = response[0][1]
+            entries.extend(fresh)
+            row_count += sum(self._row_count(fields) for _, fields in fresh)
+            if len(fresh) < INGEST_READ_COUNT:
+                break
+
+        entry_ids = []
+        rows = []
+        for entry_id, fields in entries:
+            entry_ids.append(entry_id)
+            # Entries deleted while pending come back without fields
+            if not fields:
+                continue
+            rows.extend(
+                (ParcelResult(**res), fields["worker_id"])
+                for res in json.loads(fields["results"])
+            )
+        return entry_ids, rows
+
+    def _row_count(self, fields) -> int:
+        return int(fields["count"]) if fields else 0
+
+    async def acknowledge(self, entry_ids: List[str]):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(INGEST_STREAM_KEY, INGEST_GROUP, *entry_ids)
+            pipe.xdel(INGEST_STREAM_KEY, *entry_ids)
+            await pipe.execute()
+
+async def run_ingest_writer(redis: Redis, name: str = "0", error_backoff: float = 1.0):
+    """
+    Persist queued submissions in large batches, then complete their tasks.
+    Entries are only acknowledged after the database commit, so a failed write
+    is retried from the stream instead of being lost.
+    """
+    ingest = ResultIngest(redis)
+    queue = get_worker_queue(redis)
+    cache = CacheService(redis)
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{name}"
+    logger.info("ingest_writer_started", consumer=consumer)
+    while True:
+        try:
+            await ingest.ensure_group()
+            while True:
+                entry_ids, rows = await ingest.read_batch(consumer)
+                if not entry_ids:
+                    continue
+
+                async with db_manager.async_session_maker() as session:
+                    property_service = PropertyService(session, cache=cache)
+                    outcomes = await property_service.upsert_rows(rows)
+                    await property_service.commit()
+
+                response = await complete_results(queue, rows, outcomes)
+                await ingest.acknowledge(entry_ids)
+                logger.info("results_ingested", consumer=consumer, submissions=len(entry_ids),
+                            inserted=response.inserted, updated=response.updated,
+                            unchanged=response.unchanged, failed=response.failed)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("ingest_writer_failed", consumer=consumer, error=str(e))
+            await asyncio.sleep(error_backoff)
@@ -1,46 +1,260 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, literal_column, text
 from sqlalchemy.dialects.postgresql import insert
 from app.models.parcel import Parcel
 from app.models.worker import ParcelResult
-from datetime import datetime
+from app.core.metrics import PARCELS_UPSERTED
+from app.services.cache import CacheService
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple, Union
+import hashlib
+import json
+import uuid
 import structlog
 
 logger = structlog.get_logger()
 
+# Rows per multi-row INSERT; 8 bind parameters per row keeps well under asyncpg's 32767 limit
+UPSERT_CHUNK_SIZE = 1000
+
+# Columns of _parcel_platform_uc
+PARCEL_KEY_COLUMNS = ["parcel_id", "platform", "state", "county"]
+
+# Submissions with at least this many distinct parcels are loaded with COPY
+# into parcels_staging (migrations/002_parcels_staging.sql) and merged from there
+COPY_THRESHOLD_ROWS = 5000
+
+STAGING_COLUMNS = ["load_id", *PARCEL_KEY_COLUMNS, "data", "scraped_at", "worker_id", "content_hash"]
+
+MERGE_STAGING_SQL = text("""
+INSERT INTO parcels (parcel_id, platform, state, county, data, scraped_at, worker_id, content_hash)
+SELECT parcel_id, platform, state, county, data, scraped_at, worker_id, content_hash
+FROM parcels_staging
+WHERE load_id = :load_id
+ON CONFLICT (parcel_id, platform, state, county) DO UPDATE SET
+    data = EXCLUDED.data,
+    scraped_at = EXCLUDED.scraped_at,
+    worker_id = EXCLUDED.worker_id,
+    content_hash = EXCLUDED.content_hash
+WHERE parcels.content_hash IS DISTINCT FROM EXCLUDED.content_hash
+RETURNING parcel_id, platform, state, county, (xmax = 0) AS inserted
+""")
+
+CLEAR_STAGING_SQL = text("DELETE FROM parcels_staging WHERE load_id = :load_id")
+
 class PropertyService:
-    def __init__(self, session: AsyncSession):
+    def __init__(self, session: AsyncSession, cache: Optional[CacheService] = None):
         self.session = session
+        self.cache = cache
+        # Parcels written since the last commit, whose cached details become stale with it
+        self._changed_parcels: Set[str] = set()
 
-    async def upsert_parcel(self, result: ParcelResult, worker_id: str) -> bool:
+    async def commit(self):
         """
-        Upsert a parcel result. Returns True if inserted, False if updated.
+        Commit the session, then invalidate cached details of the parcels it changed.
         """
-        stmt = insert(Parcel).values(
-            parcel_id=result.parcel_id,
-            platform=result.platform,
-            state=result.state,
-            county=result.county,
-            data=result.data,
-            scraped_at=result.scraped_at,
-            worker_id=worker_id
-        )
+        await self.session.commit()
+        changed, self._changed_parcels = self._changed_parcels, set()
+        if self.cache and changed:
+            try:
+                await self.cache.invalidate_properties(changed)
+            except Exception as e:
+                # The write is committed either way; entries expire with their TTL
+                logger.error("cache_invalidation_failed", count=len(changed), error=str(e))
+
+    def _parcel_key(self, result: ParcelResult) -> Tuple[str, str, str, str]:
+        return (result.parcel_id, result.platform, result.state, result.county)
+
+    def _content_hash(self, result: ParcelResult) -> str:
+        # Hash of the parsed data rather than raw_html_hash, so parser fixes still get written
+        canonical = json.dumps(result.data, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
 
-        # On conflict, update the data and scraped_at
-        update_stmt = stmt.on_conflict_do_update(
-            constraint='_parcel_platform_uc',
+    def _upsert_statement(self, rows: List[Tuple[ParcelResult, str]]):
+        stmt = insert(Parcel).values([
+            {
+                "parcel_id": result.parcel_id,
+                "platform": result.platform,
+                "state": result.state,
+                "county": result.county,
+                "data": result.data,
+                "scraped_at": result.scraped_at,
+                "worker_id": worker_id,
+                "content_hash": self._content_hash(result)
+            }
+            for result, worker_id in rows
+        ])
+
+        # On conflict, update the data and scraped_at, unless the content is unchanged:
+        # an identical re-scrape leaves the row alone, so scraped_at is when its content was seen.
+        # Columns rather than the name: migrations create _parcel_platform_uc as a unique index
+        upsert_stmt = stmt.on_conflict_do_update(
+            index_elements=PARCEL_KEY_COLUMNS,
             set_={
                 "data": stmt.excluded.data,
                 "scraped_at": stmt.excluded.scraped_at,
-                "worker_id": stmt.excluded.worker_id
-            }
+                "worker_id": stmt.excluded.worker_id,
+                "content_hash": stmt.excluded.content_hash
+            },
+            where=Parcel.content_hash.is_distinct_from(stmt.excluded.content_hash)
+        )
+
+        # xmax is only set on a row version written by an UPDATE, so 0 means the row was inserted
+        return upsert_stmt.returning(
+            Parcel.parcel_id, Parcel.platform, Parcel.state, Parcel.county,
+            literal_column("xmax = 0").label("inserted")
         )
 
+    async def _execute_upsert(
+        self, rows: List[Tuple[ParcelResult, str]]
+    ) -> Dict[Tuple[str, str, str, str], Optional[bool]]:
+        # RETURNING order is not guaranteed to follow VALUES order, so match rows by key
+        returned = await self.session.execute(self._upsert_statement(rows))
+        written = {
+            (row.parcel_id, row.platform, row.state, row.county): row.inserted
+            for row in returned
+        }
+
+        # Rows the upsert skipped hold the same content already
+        for result, _ in rows:
+            written.setdefault(self._parcel_key(result), None)
+        return written
+
+    def _record_upserts(self, outcomes: List[Tuple[ParcelResult, Optional[bool]]]):
+        for result, inserted in outcomes:
+            if inserted is None:
+                outcome = "unchanged"
+            else:
+                outcome = "inserted" if inserted else "updated"
+                self._changed_parcels.add(result.parcel_id)
+            PARCELS_UPSERTED.labels(platform=result.platform, county=result.county, outcome=outcome).inc()
+
+    async def upsert_parcel(self, result: ParcelResult, worker_id: str) -> bool:
+        """
+        Upsert a parcel result. Returns True if inserted, False if updated or unchanged.
+        """
         try:
-            res = await self.session.execute(update_stmt)
-            # In SQLAlchemy with asyncpg, we might not get 'inserted' vs 'updated' easily from execute()
-            # but the operation is atomic.
-            return True # Simplified for now
+            inserted = (await self._execute_upsert([(result, worker_id)]))[self._parcel_key(result)]
         except Exception as e:
             logger.error("upsert_parcel_failed", parcel_id=result.parcel_id, error=str(e))
             raise
+
+        self._record_upserts([(result, inserted)])
+        return bool(inserted)
+
+    async def upsert_parcels(
+        self, results: List[ParcelResult], worker_id: str, chunk_size: int = UPSERT_CHUNK_SIZE
+    ) -> List[Union[Optional[bool], Exception]]:
+        """
+        Upsert a whole submission with multi-row INSERT ... ON CONFLICT statements.
+        Returns one outcome per result, in order: True if inserted, False if updated,
+        None if the stored content was identical and nothing was written,
+        or the exception that row failed with. When a parcel appears more than once
+        only the last result is written; the earlier ones count as updated by it.
+        """
+        return await self.upsert_rows([(result, worker_id) for result in results], chunk_size)
+
+    async def upsert_rows(
+        self, rows: List[Tuple[ParcelResult, str]], chunk_size: int = UPSERT_CHUNK_SIZE
+    ) -> List[Union[Optional[bool], Exception]]:
+        """
+        Like upsert_parcels, for (result, worker_id) rows submitted by several workers.
+        """
+        # One statement cannot touch the same row twice; the last result for a parcel wins
+        latest: Dict[Tuple[str, str, str, str], int] = {}
+        for index, (result, _) in enumerate(rows):
+            latest[self._parcel_key(result)] = index
+        unique = [rows[index] for index in sorted(latest.values())]
+
+        written: Dict[Tuple[str, str, str, str], Union[Optional[bool], Exception]] = {}
+        if len(unique) >= COPY_THRESHOLD_ROWS:
+            try:
+                async with self.session.begin_nested():
+                    written.update(await self._copy_upsert(unique))
+            except Exception as e:
+                # Fall back to INSERTs, which can pinpoint bad rows
+                logger.warning("copy_upsert_failed", count=len(unique), error=str(e))
+                written.clear()
+        if not written:
+            written.update(await self._batched_upsert(unique, chunk_size))
+
+        self._record_upserts([
+            (result, written[self._parcel_key(result)])
+            for result, _ in unique
+            if not isinstance(written[self._parcel_key(result)], Exception)
+        ])
+
+        outcomes = []
+        for index, (result, _) in enumerate(rows):
+            outcome = written[self._parcel_key(result)]
+            if latest[self._parcel_key(result)] != index and not isinstance(outcome, Exception):
+                outcome = False
+            outcomes.append(outcome)
+        return outcomes
+
+    async def _batched_upsert(
+        self, rows: List[Tuple[ParcelResult, str]], chunk_size: int
+    ) -> Dict[Tuple[str, str, str, str], Union[Optional[bool], Exception]]:
+        written: Dict[Tuple[str, str, str, str], Union[Optional[bool], Exception]] = {}
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                # Savepoint so a bad row does not abort the rest of the submission
+                async with self.session.begin_nested():
+                    written.update(await self._execute_upsert(chunk))
+            except Exception as e:
+                logger.warning("upsert_parcels_batch_failed", count=len(chunk), error=str(e))
+                # Retry the chunk row by row to find out which rows are bad
+                for result, worker_id in chunk:
+                    try:
+                        async with self.session.begin_nested():
+                            written.update(await self._execute_upsert([(result, worker_id)]))
+                    except Exception as row_error:
+                        logger.error("upsert_parcel_failed", parcel_id=result.parcel_id, error=str(row_error))
+                        written[self._parcel_key(result)] = row_error
+        return written
+
+    async def _copy_upsert(
+        self, rows: List[Tuple[ParcelResult, str]]
+    ) -> Dict[Tuple[str, str, str, str], Optional[bool]]:
+        """
+        Stream rows into the unlogged staging table with COPY and merge them into
+        parcels with a single INSERT ... SELECT ... ON CONFLICT. Rows must be unique per parcel.
+        """
+        load_id = uuid.uuid4()
+
+        # COPY runs on the session's own connection, inside its transaction
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(
+            "parcels_staging",
+            columns=STAGING_COLUMNS,
+            records=[
+                (
+                    load_id,
+                    result.parcel_id,
+                    result.platform,
+                    result.state,
+                    result.county,
+                    json.dumps(result.data),
+                    # Worker timestamps are naive UTC
+                    result.scraped_at if result.scraped_at.tzinfo else result.scraped_at.replace(tzinfo=timezone.utc),
+                    worker_id,
+                    self._content_hash(result)
+                )
+                for result, worker_id in rows
+            ]
+        )
+
+        returned = await self.session.execute(MERGE_STAGING_SQL, {"load_id": load_id})
+        written = {
+            (row.parcel_id, row.platform, row.state, row.county): row.inserted
+            for row in returned
+        }
+        # Parcels the merge skipped hold the same content already
+        for result, _ in rows:
+            written.setdefault(self._parcel_key(result), None)
+        await self.session.execute(CLEAR_STAGING_SQL, {"load_id": load_id})
+
+        logger.info("copy_upsert_completed", load_id=str(load_id), count=len(rows))
+        return written
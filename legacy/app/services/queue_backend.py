@@ -0,0 +1,12 @@
+from redis.asyncio import Redis
+import os
+from app.services.worker_queue import WorkerQueue
+from app.services.stream_queue import StreamWorkerQueue
+
+# "list" (default) keeps tasks in Redis lists, "stream" uses Redis Streams consumer groups
+WORKER_QUEUE_BACKEND = os.getenv("WORKER_QUEUE_BACKEND", "list")
+
+def get_worker_queue(redis: Redis) -> WorkerQueue:
+    if WORKER_QUEUE_BACKEND == "stream":
+        return StreamWorkerQueue(redis)
+    return WorkerQueue(redis)
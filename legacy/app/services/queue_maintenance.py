@@ -0,0 +1,47 @@
+from redis.asyncio import Redis
+import asyncio
+import structlog
+from app.core.metrics import TASKS_REQUEUED
+from app.services.queue_backend import get_worker_queue
+
+logger = structlog.get_logger()
+
+async def run_lease_reaper(redis: Redis, interval: float = 30.0):
+    """
+    Periodically re-queue tasks held by workers that stopped renewing their leases.
+    Safe to run in every gateway process: each reap is an atomic script.
+    """
+    queue = get_worker_queue(redis)
+    logger.info("lease_reaper_started", interval=interval)
+    while True:
+        try:
+            requeued = await queue.reap_expired_leases()
+            if requeued:
+                TASKS_REQUEUED.labels(reason="lease_expired").inc(requeued)
+                logger.warning("leases_reaped", count=requeued)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("lease_reaper_failed", error=str(e))
+        await asyncio.sleep(interval)
+
+async def run_retry_promoter(redis: Redis, interval: float = 5.0, batch_size: int = 500):
+    """
+    Periodically move due retries back to their priority queues, in batches.
+    """
+    queue = get_worker_queue(redis)
+    logger.info("retry_promoter_started", interval=interval)
+    while True:
+        try:
+            while True:
+                promoted = await queue.promote_retries(limit=batch_size)
+                if promoted:
+                    TASKS_REQUEUED.labels(reason="retry").inc(promoted)
+                    logger.info("retries_promoted", count=promoted)
+                if promoted < batch_size:
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("retry_promoter_failed", error=str(e))
+        await asyncio.sleep(interval)
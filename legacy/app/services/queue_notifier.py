@@ -0,0 +1,73 @@
+from redis.asyncio import Redis
+import asyncio
+import structlog
+from typing import Dict, List, Optional
+
+logger = structlog.get_logger()
+
+# Published with the platform name whenever tasks land on a queue
+QUEUE_NOTIFY_CHANNEL = "queue:notify"
+
+class QueueNotifier:
+    """
+    Wakes up long-polling workers when tasks are queued for their platforms.
+    A single pub/sub connection per process serves every waiter, so blocked
+    requests do not hold connections from the shared Redis pool.
+    """
+    def __init__(self):
+        self._events: Dict[str, asyncio.Event] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def watch(self, platforms: List[str]) -> List[asyncio.Event]:
+        """
+        Snapshot the wake-up events for `platforms`.
+        Take it before checking the queues so no notification is missed in between.
+        """
+        return [self._events.setdefault(platform, asyncio.Event()) for platform in platforms]
+
+    async def wait(self, events: List[asyncio.Event], timeout: float) -> bool:
+        """
+        Wait until any of the watched platforms is notified or `timeout` passes.
+        """
+        waiters = [asyncio.ensure_future(event.wait()) for event in events]
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return bool(done)
+
+    def notify(self, platform: str):
+        # Each event fires once; the next watch() creates a fresh one
+        event = self._events.pop(platform, None)
+        if event:
+            event.set()
+
+    async def start(self, redis: Redis):
+        self._listener = asyncio.create_task(self._listen(redis))
+        logger.info("queue_notifier_started", channel=QUEUE_NOTIFY_CHANNEL)
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def _listen(self, redis: Redis):
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(QUEUE_NOTIFY_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.notify(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Waiters fall back to periodic re-checks until we resubscribe
+                logger.error("queue_notifier_failed", error=str(e))
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+queue_notifier = QueueNotifier()
@@ -0,0 +1,114 @@
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+def parse_platform_weights(value: str) -> Dict[str, float]:
+    """
+    Parse "beacon=3,qpublic=1" into {"beacon": 3.0, "qpublic": 1.0}.
+    Blank entries are skipped; a malformed or negative weight raises ValueError.
+    """
+    weights: Dict[str, float] = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        platform, sep, weight = entry.partition("=")
+        platform = platform.strip()
+        if not sep or not platform:
+            raise ValueError(f"Invalid platform weight entry: {entry!r}")
+        weights[platform] = float(weight)
+        if weights[platform] < 0:
+            raise ValueError(f"Negative weight for platform {platform!r}")
+    return weights
+
+# Relative share of claims per platform; unlisted platforms weigh 1
+PLATFORM_WEIGHTS: Dict[str, float] = parse_platform_weights(os.getenv("QUEUE_PLATFORM_WEIGHTS", ""))
+
+# Relative share of claims per priority within a platform.
+# Low priorities keep a small guaranteed share, and unused credit
+# accumulates while their queue is waiting, so they age into a slot.
+PRIORITY_WEIGHTS: Dict[int, float] = {1: 8, 2: 4, 3: 2, 4: 1}
+
+PRIORITIES = (1, 2, 3, 4)
+
+@dataclass
+class QueueSlot:
+    platform: str
+    priority: int
+    quota: int          # tasks guaranteed to this queue in the first pass
+    credit: float = 0.0
+
+class QueueScheduler(ABC):
+    """
+    Decides which queues a claim walks and how many tasks each may contribute.
+    The claim script first takes up to `quota` from every slot, then fills the
+    remaining capacity walking the slots in order.
+    """
+    @abstractmethod
+    def plan(self, platforms: List[str], capacity: int) -> List[QueueSlot]:
+        ...
+
+    def record(self, slots: List[QueueSlot], claimed: Dict[Tuple[str, int], int], backlog: List[int]):
+        """
+        Feedback after a claim: tasks taken per (platform, priority) and the
+        queue length left behind in each slot.
+        """
+
+class StrictPriorityScheduler(QueueScheduler):
+    """
+    Platforms in the order the worker lists them, priorities 1 (urgent) to 4 (low).
+    """
+    def plan(self, platforms: List[str], capacity: int) -> List[QueueSlot]:
+        return [
+            QueueSlot(platform=platform, priority=priority, quota=0)
+            for platform in platforms
+            for priority in PRIORITIES
+        ]
+
+class WeightedFairScheduler(QueueScheduler):
+    """
+    Deficit round robin across (platform, priority) queues.
+    Each claim grants every queue a share of the capacity proportional to its
+    platform and priority weights. Fractional shares carry over as credit
+    while the queue is backlogged and reset once it is drained.
+    """
+    def __init__(
+        self,
+        platform_weights: Optional[Dict[str, float]] = None,
+        priority_weights: Optional[Dict[int, float]] = None
+    ):
+        self.platform_weights = PLATFORM_WEIGHTS if platform_weights is None else platform_weights
+        self.priority_weights = PRIORITY_WEIGHTS if priority_weights is None else priority_weights
+        self._deficits: Dict[Tuple[str, int], float] = {}
+        self._round = 0
+
+    def plan(self, platforms: List[str], capacity: int) -> List[QueueSlot]:
+        platform_weights = {p: self.platform_weights.get(p, 1.0) for p in platforms}
+        platform_total = sum(platform_weights.values()) or 1.0
+        priority_total = sum(self.priority_weights.get(q, 1.0) for q in PRIORITIES)
+
+        # Rotate the platform order so leftover capacity is not always offered to the same one
+        offset = self._round % len(platforms) if platforms else 0
+        self._round += 1
+        rotated = platforms[offset:] + platforms[:offset]
+
+        slots = []
+        for priority in PRIORITIES:
+            for platform in rotated:
+                share = (capacity * platform_weights[platform] / platform_total
+                         * self.priority_weights.get(priority, 1.0) / priority_total)
+                credit = self._deficits.get((platform, priority), 0.0) + share
+                slots.append(QueueSlot(platform=platform, priority=priority, quota=int(credit), credit=credit))
+        return slots
+
+    def record(self, slots: List[QueueSlot], claimed: Dict[Tuple[str, int], int], backlog: List[int]):
+        for slot, remaining in zip(slots, backlog):
+            key = (slot.platform, slot.priority)
+            if remaining == 0:
+                # Drained queues do not bank credit
+                self._deficits.pop(key, None)
+            else:
+                self._deficits[key] = max(0.0, slot.credit - claimed.get(key, 0))
+
+default_scheduler = WeightedFairScheduler()
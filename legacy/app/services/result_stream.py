@@ -0,0 +1,141 @@
+from typing import Any, AsyncIterator, List, Optional, Tuple
+import json
+import msgpack
+import structlog
+from pydantic import ValidationError
+from app.models.worker import ParcelResult, SubmitResponse
+from app.services.ingest import ResultIngest
+from app.services.properties import PropertyService, COPY_THRESHOLD_ROWS
+from app.services.results import process_results
+from app.services.worker_queue import WorkerQueue
+
+logger = structlog.get_logger()
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/jsonl"}
+MSGPACK_MEDIA_TYPES = {"application/msgpack", "application/x-msgpack", "application/vnd.msgpack"}
+
+# Rows buffered before they are written; large enough to take the COPY path
+STREAM_CHUNK_ROWS = COPY_THRESHOLD_ROWS
+
+# Upper bound on a single encoded result, so a missing delimiter cannot grow the buffer forever
+MAX_RECORD_BYTES = 16 * 1024 * 1024
+
+class RecordTooLarge(ValueError):
+    pass
+
+async def _iter_ndjson(body: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    # Pieces of a line that spans several body chunks, joined once it is complete
+    pending: List[bytes] = []
+    pending_size = 0
+    async for data in body:
+        *lines, rest = data.split(b"\n")
+        if lines:
+            lines[0] = b"".join(pending) + lines[0]
+            pending, pending_size = [], 0
+        for line in lines:
+            if line.strip():
+                yield _decode_json(line)
+        if rest:
+            pending.append(rest)
+            pending_size += len(rest)
+            if pending_size > MAX_RECORD_BYTES:
+                raise RecordTooLarge(f"Record exceeds {MAX_RECORD_BYTES} bytes")
+    last = b"".join(pending)
+    if last.strip():
+        yield _decode_json(last)
+
+def _decode_json(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+async def _iter_msgpack(body: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    # timestamp=3 decodes the msgpack timestamp extension to datetime
+    unpacker = msgpack.Unpacker(raw=False, timestamp=3, max_buffer_size=MAX_RECORD_BYTES)
+    received = 0
+    async for data in body:
+        received += len(data)
+        try:
+            unpacker.feed(data)
+        except msgpack.BufferFull:
+            raise RecordTooLarge(f"Record exceeds {MAX_RECORD_BYTES} bytes")
+        try:
+            for obj in unpacker:
+                yield obj
+        except (msgpack.UnpackException, ValueError) as e:
+            # Unlike NDJSON there is no delimiter to resync on, so the rest of the stream is lost
+            yield ValueError(f"malformed msgpack, rest of stream skipped: {e}")
+            return
+    if unpacker.tell() < received:
+        yield ValueError("truncated msgpack record at end of stream")
+
+async def iter_result_chunks(
+    body: AsyncIterator[bytes], media_type: str, chunk_size: int = STREAM_CHUNK_ROWS
+) -> AsyncIterator[Tuple[List[ParcelResult], List[str]]]:
+    """
+    Parse a streamed submission incrementally.
+    Yields (valid results, errors for invalid records) at most chunk_size records at a time.
+    """
+    if media_type in MSGPACK_MEDIA_TYPES:
+        records = _iter_msgpack(body)
+    elif media_type in NDJSON_MEDIA_TYPES:
+        records = _iter_ndjson(body)
+    else:
+        raise ValueError(f"Unsupported media type: {media_type}")
+
+    results: List[ParcelResult] = []
+    errors: List[str] = []
+    index = 0
+    async for record in records:
+        index += 1
+        if isinstance(record, Exception):
+            errors.append(f"record {index}: {record}")
+        else:
+            try:
+                results.append(ParcelResult.model_validate(record))
+            except ValidationError as e:
+                errors.append(f"record {index}: {e}")
+
+        if len(results) + len(errors) >= chunk_size:
+            yield results, errors
+            results, errors = [], []
+
+    if results or errors:
+        yield results, errors
+
+async def submit_result_stream(
+    body: AsyncIterator[bytes],
+    media_type: str,
+    worker_id: str,
+    property_service: PropertyService,
+    queue: WorkerQueue,
+    ingest: Optional[ResultIngest] = None
+) -> SubmitResponse:
+    """
+    Persist a streamed submission chunk by chunk, or queue each chunk for the
+    ingest writers when ingest is given. Memory use is bounded by the chunk size.
+    """
+    response = SubmitResponse(inserted=0, updated=0, failed=0)
+    async for results, errors in iter_result_chunks(body, media_type):
+        response.failed += len(errors)
+        response.errors.extend(errors)
+        if not results:
+            continue
+
+        if ingest:
+            await ingest.enqueue(results, worker_id)
+            response.queued += len(results)
+            continue
+
+        chunk_response = await process_results(property_service, queue, results, worker_id)
+        response.inserted += chunk_response.inserted
+        response.updated += chunk_response.updated
+        response.unchanged += chunk_response.unchanged
+        response.failed += chunk_response.failed
+        response.errors.extend(chunk_response.errors)
+
+    logger.info("result_stream_processed", worker_id=worker_id, inserted=response.inserted,
+                updated=response.updated, unchanged=response.unchanged,
+                failed=response.failed, queued=response.queued)
+    return response
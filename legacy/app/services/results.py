@@ -0,0 +1,79 @@
+from typing import List, Optional, Tuple, Union
+import structlog
+from app.models.worker import ParcelResult, SubmitResponse
+from app.services.properties import PropertyService
+from app.services.worker_queue import WorkerQueue
+
+logger = structlog.get_logger()
+
+async def process_results(
+    property_service: PropertyService,
+    queue: WorkerQueue,
+    results: List[ParcelResult],
+    worker_id: str
+) -> SubmitResponse:
+    """
+    Persist a batch of worker results and mark their tasks as complete.
+    Tasks are only completed once the batch is committed.
+    Rows that fail to persist are reported in the response and their tasks stay in flight.
+    """
+    rows = [(res, worker_id) for res in results]
+
+    # 1. Persist to PostgreSQL in as few statements as possible
+    outcomes = await property_service.upsert_rows(rows)
+    await property_service.commit()
+
+    # 2. Mark tasks as completed in the queue
+    return await complete_results(queue, rows, outcomes)
+
+async def complete_results(
+    queue: WorkerQueue,
+    rows: List[Tuple[ParcelResult, str]],
+    outcomes: List[Union[Optional[bool], Exception]]
+) -> SubmitResponse:
+    """
+    Complete the tasks of persisted (result, worker_id) rows and tally the upsert outcomes.
+    """
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    failed = 0
+    errors = []
+
+    persisted = []
+    for (res, worker_id), outcome in zip(rows, outcomes):
+        if isinstance(outcome, Exception):
+            failed += 1
+            errors.append(str(outcome))
+            logger.error("result_processing_failed", task_id=res.task_id, error=str(outcome))
+        else:
+            persisted.append((res, worker_id, outcome))
+
+    try:
+        # One pipelined round trip for the whole batch
+        await queue.complete_tasks([(worker_id, res.task_id) for res, worker_id, _ in persisted])
+    except Exception as e:
+        logger.error("result_completion_failed", count=len(persisted), error=str(e))
+        return SubmitResponse(
+            inserted=0,
+            updated=0,
+            failed=failed + len(persisted),
+            errors=errors + [str(e)] * len(persisted)
+        )
+
+    for res, worker_id, outcome in persisted:
+        if outcome is None:
+            unchanged += 1
+        elif outcome:
+            inserted += 1
+        else:
+            updated += 1
+        logger.info("result_processed", task_id=res.task_id, parcel_id=res.parcel_id, worker_id=worker_id)
+
+    return SubmitResponse(
+        inserted=inserted,
+        updated=updated,
+        failed=failed,
+        errors=errors,
+        unchanged=unchanged
+    )
@@ -0,0 +1,271 @@
+from redis.asyncio import Redis
+import json
+import structlog
+from collections import Counter
+from typing import List, Optional
+from app.models.worker import WorkTask, TaskFailResponse
+from app.services.queue_notifier import QUEUE_NOTIFY_CHANNEL
+from app.services.worker_queue import (
+    WorkerQueue,
+    ENQUEUE_LUA,
+    RELEASE_FINGERPRINT_LUA,
+    RETRY_OR_DEAD_LETTER_LUA,
+    LEASE_TIMEOUT_SECONDS,
+    RETRY_KEYS,
+    RETRY_ATTEMPTS_KEY,
+    DEDUP_FINGERPRINTS_KEY,
+    DEDUP_TASKS_KEY,
+)
+
+logger = structlog.get_logger()
+
+# Consumer group shared by all workers; each worker reads as its own consumer
+STREAM_GROUP = "workers"
+
+# task_id -> {stream, id, consumer} of the entry currently delivered to a worker
+STREAM_INFLIGHT_KEY = "stream:inflight"
+
+# Stream counterpart of ENQUEUE_LUA: appends to stream:{platform}:p{priority}
+# and creates the consumer group on first use. Like ENQUEUE_LUA it builds the
+# stream key from the payload, assuming a single Redis instance.
+STREAM_ENQUEUE_LUA = """
+local notified = {}
+local groups = {}
+local function enqueue(raw, command)
+    local task = cjson.decode(raw)
+    local stream_key = 'stream:' .. task['platform'] .. ':p' .. (task['priority'] or 3)
+    if not groups[stream_key] then
+        groups[stream_key] = true
+        redis.pcall('XGROUP', 'CREATE', stream_key, '""" + STREAM_GROUP + """', '0', 'MKSTREAM')
+    end
+    redis.call('XADD', stream_key, '*', 'task', raw)
+    if not notified[task['platform']] then
+        notified[task['platform']] = true
+        redis.call('PUBLISH', '""" + QUEUE_NOTIFY_CHANNEL + """', task['platform'])
+    end
+end
+"""
+
+# Lua script for atomic batched claim from consumer groups
+# KEYS[1..n-2] - stream keys in the order given by the scheduler
+# KEYS[n-1] - in-flight entries hash
+# KEYS[n] - set of streams the worker holds entries in
+# ARGV[1] - capacity (max tasks to claim)
+# ARGV[2] - consumer group
+# ARGV[3] - consumer (worker_id)
+# ARGV[4] - idle time (ms) after which another worker's entry is redelivered
+# ARGV[5..] - first-pass quota of each stream key
+# Returns {claimed payloads, undelivered entries left behind}
+STREAM_CLAIM_TASKS_LUA = """
+local inflight_key = KEYS[#KEYS - 1]
+local held_streams_key = KEYS[#KEYS]
+local stream_count = #KEYS - 2
+local capacity = tonumber(ARGV[1])
+local claimed = {}
+local taken = {}
+
+local function take(stream_key, entries)
+    for _, entry in ipairs(entries) do
+        -- Entries deleted while pending come back without fields;
+        -- the second pass may auto-claim entries the first pass just took.
+        -- Entry IDs are only unique within a stream, so key on both.
+        if entry and entry[2] and not taken[stream_key .. ' ' .. entry[1]] then
+            local raw = entry[2][2]
+            redis.call('HSET', inflight_key, cjson.decode(raw)['task_id'],
+                cjson.encode({stream = stream_key, id = entry[1], consumer = ARGV[3]}))
+            taken[stream_key .. ' ' .. entry[1]] = true
+            claimed[#claimed + 1] = raw
+        end
+    end
+    if #entries > 0 then
+        redis.call('SADD', held_streams_key, stream_key)
+    end
+end
+
+local function claim(stream_key, limit)
+    local before = #claimed
+    local want = math.min(limit, capacity - before)
+    if want <= 0 then
+        return
+    end
+
+    -- Redeliver entries whose consumer stopped renewing them first
+    local stale = redis.pcall('XAUTOCLAIM', stream_key, ARGV[2], ARGV[3], ARGV[4], '0-0', 'COUNT', want)
+    if stale['err'] then
+        -- No stream or group yet: nothing was ever queued here
+        return
+    end
+    take(stream_key, stale[2])
+
+    want = want - (#claimed - before)
+    if want > 0 then
+        local fresh = redis.call('XREADGROUP', 'GROUP', ARGV[2], ARGV[3], 'COUNT', want,
+            'STREAMS', stream_key, '>')
+        if fresh and fresh[1] then
+            take(stream_key, fresh[1][2])
+        end
+    end
+end
+
+-- First pass honours each stream's quota, second pass fills what is left in order
+for i = 1, stream_count do
+    claim(KEYS[i], tonumber(ARGV[4 + i]))
+end
+for i = 1, stream_count do
+    claim(KEYS[i], capacity)
+end
+
+local backlog = {}
+for i = 1, stream_count do
+    local pending = redis.pcall('XPENDING', KEYS[i], ARGV[2])
+    if pending['err'] then
+        backlog[i] = 0
+    else
+        backlog[i] = redis.call('XLEN', KEYS[i]) - pending[1]
+    end
+end
+return {claimed, backlog}
+"""
+
+# Lua script for acknowledging a completed task
+# The entry's stream key is read from the in-flight hash (single Redis instance)
+# KEYS[1] - in-flight entries hash
+# KEYS[2] - task_id -> failed attempts
+# KEYS[3..4] - dedup fingerprints set and task_id -> fingerprint hash
+# ARGV[1] - task_id
+# ARGV[2] - consumer group
+# ARGV[3] - consumer (worker_id)
+STREAM_COMPLETE_TASK_LUA = RELEASE_FINGERPRINT_LUA + """
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if not entry then
+    return 0
+end
+
+entry = cjson.decode(entry)
+-- The entry may have been redelivered to another worker since
+if entry['consumer'] ~= ARGV[3] then
+    return 0
+end
+redis.call('XACK', entry['stream'], ARGV[2], entry['id'])
+redis.call('XDEL', entry['stream'], entry['id'])
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+release_fingerprint({KEYS[3], KEYS[4]}, ARGV[1])
+return 1
+"""
+
+# Lua script for failing a task: ack the entry, then retry or dead-letter it
+# KEYS[1] - in-flight entries hash
+# KEYS[2..6] - retry keys, see RETRY_OR_DEAD_LETTER_LUA
+# ARGV[1..7] - see RETRY_OR_DEAD_LETTER_LUA
+# ARGV[8] - consumer group
+# ARGV[9] - consumer (worker_id)
+STREAM_FAIL_TASK_LUA = RETRY_OR_DEAD_LETTER_LUA + """
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if not entry then
+    return {0, 0, 0}
+end
+
+entry = cjson.decode(entry)
+if entry['consumer'] ~= ARGV[9] then
+    return {0, 0, 0}
+end
+local found = redis.call('XRANGE', entry['stream'], entry['id'], entry['id'])
+redis.call('XACK', entry['stream'], ARGV[8], entry['id'])
+redis.call('XDEL', entry['stream'], entry['id'])
+redis.call('HDEL', KEYS[1], ARGV[1])
+if #found == 0 then
+    return {0, 0, 0}
+end
+
+return retry_or_dead_letter({KEYS[2], KEYS[3], KEYS[4], KEYS[5], KEYS[6]}, found[1][2][2])
+"""
+
+# Lua script for resetting the idle time of every entry a worker holds
+# KEYS - streams the worker holds entries in
+# ARGV[1] - consumer group
+# ARGV[2] - consumer (worker_id)
+STREAM_RENEW_LEASES_LUA = """
+local renewed = 0
+for _, stream_key in ipairs(KEYS) do
+    local pending = redis.pcall('XPENDING', stream_key, ARGV[1], '-', '+', 1000, ARGV[2])
+    if not pending['err'] and #pending > 0 then
+        local args = {stream_key, ARGV[1], ARGV[2], 0}
+        for _, entry in ipairs(pending) do
+            args[#args + 1] = entry[1]
+        end
+        -- JUSTID resets the idle time without counting a new delivery
+        args[#args + 1] = 'JUSTID'
+        redis.call('XCLAIM', unpack(args))
+        renewed = renewed + #pending
+    end
+end
+return renewed
+"""
+
+class StreamWorkerQueue(WorkerQueue):
+    """
+    Worker queue on Redis Streams consumer groups.
+    Claims use XREADGROUP, completion is an XACK, and entries whose consumer
+    stops renewing them are redelivered with XAUTOCLAIM on the next claim.
+    """
+    def _get_script(self, lua: str):
+        # Scripts that re-queue tasks share the enqueue helper; swap in the stream version
+        if lua.startswith(ENQUEUE_LUA):
+            lua = STREAM_ENQUEUE_LUA + lua[len(ENQUEUE_LUA):]
+        return super()._get_script(lua)
+
+    def _get_stream_key(self, platform: str, priority: int) -> str:
+        return f"stream:{platform}:p{priority}"
+
+    def _get_held_streams_key(self, worker_id: str) -> str:
+        return f"processing:{worker_id}:streams"
+
+    async def _claim_tasks(self, worker_id: str, platforms: List[str], capacity: int) -> List[WorkTask]:
+        slots = self.scheduler.plan(platforms, capacity)
+        stream_keys = [self._get_stream_key(slot.platform, slot.priority) for slot in slots]
+
+        raw_tasks, backlog = await self._get_script(STREAM_CLAIM_TASKS_LUA)(
+            keys=[*stream_keys, STREAM_INFLIGHT_KEY, self._get_held_streams_key(worker_id)],
+            args=[capacity, STREAM_GROUP, worker_id, LEASE_TIMEOUT_SECONDS * 1000,
+                  *[slot.quota for slot in slots]]
+        )
+
+        tasks = [WorkTask(**json.loads(raw_task)) for raw_task in raw_tasks]
+        self.scheduler.record(slots, Counter((task.platform, task.priority) for task in tasks), backlog)
+
+        if tasks:
+            logger.info("tasks_popped", worker_id=worker_id, count=len(tasks),
+                        task_ids=[task.task_id for task in tasks])
+        return tasks
+
+    def _complete_call(self, worker_id: str, task_id: str):
+        return self._get_script(STREAM_COMPLETE_TASK_LUA), {
+            "keys": [STREAM_INFLIGHT_KEY, RETRY_ATTEMPTS_KEY, DEDUP_FINGERPRINTS_KEY, DEDUP_TASKS_KEY],
+            "args": [task_id, STREAM_GROUP, worker_id]
+        }
+
+    async def fail_task(self, worker_id: str, task_id: str, error: Optional[str] = None) -> TaskFailResponse:
+        result = await self._get_script(STREAM_FAIL_TASK_LUA)(
+            keys=[STREAM_INFLIGHT_KEY, *RETRY_KEYS],
+            args=[*self._get_retry_args(task_id, error), STREAM_GROUP, worker_id]
+        )
+        return self._fail_response(worker_id, task_id, error, result)
+
+    async def renew_leases(self, worker_id: str) -> int:
+        """
+        Reset the idle time of the worker's pending entries so they are not redelivered.
+        """
+        held_streams = list(await self.redis.smembers(self._get_held_streams_key(worker_id)))
+        if not held_streams:
+            return 0
+        return await self._get_script(STREAM_RENEW_LEASES_LUA)(
+            keys=held_streams,
+            args=[STREAM_GROUP, worker_id]
+        )
+
+    async def reap_expired_leases(self, limit: int = 500) -> int:
+        """
+        Nothing to reap: stale pending entries are redelivered by XAUTOCLAIM on claim.
+        """
+        return 0
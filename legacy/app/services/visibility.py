@@ -0,0 +1,82 @@
+import hashlib
+import json
+from typing import Dict, FrozenSet, Optional, Union
+import structlog
+from app.models.auth import UserTier
+
+logger = structlog.get_logger()
+
+# Property detail fields each tier may see, mirroring the parser's tier rules
+# (checked against recorded parser responses in tests/fixtures/parser);
+# None = every field, internal callers only. Tiers missing here get the anonymous fields.
+ANONYMOUS_FIELDS = frozenset({
+    "parcel_id", "state", "county", "address", "property_type", "lien_amount",
+})
+FREE_FIELDS = ANONYMOUS_FIELDS | {
+    "market_value", "assessed_value", "prior_years_owed", "auction_date",
+    "struck_off_date", "platform", "scraped_at",
+}
+STARTER_FIELDS = FREE_FIELDS | {
+    "owner_name", "foreclosure_probability", "redemption_probability",
+}
+PREMIUM_FIELDS = STARTER_FIELDS | {
+    "city", "zip", "land_area_sqft", "building_area_sqft", "year_built", "bedrooms",
+    "bathrooms", "land_value", "building_value", "owner_address",
+    "certificate_number", "interest_rate", "penalty_rate", "sale_date",
+    "redemption_deadline", "status", "is_otc", "auction_type", "registration_deadline",
+    "miw_score", "karma_score", "serial_payer_score",
+}
+# Enterprise differs from premium in quotas and API access, not in fields
+ENTERPRISE_FIELDS = PREMIUM_FIELDS
+# Scrape bookkeeping the parser only returns to internal callers
+INTERNAL_FIELDS = frozenset({
+    "task_id", "worker_id", "parse_duration_ms", "raw_html_hash",
+})
+# Fields the map accounts for; any other field is hidden from external tiers and reported
+MAPPED_FIELDS = ENTERPRISE_FIELDS | INTERNAL_FIELDS
+
+TIER_FIELD_VISIBILITY: Dict[UserTier, Optional[FrozenSet[str]]] = {
+    UserTier.ANONYMOUS: ANONYMOUS_FIELDS,
+    UserTier.FREE: FREE_FIELDS,
+    UserTier.STARTER: STARTER_FIELDS,
+    UserTier.PREMIUM: PREMIUM_FIELDS,
+    UserTier.ENTERPRISE: ENTERPRISE_FIELDS,
+    UserTier.INTERNAL: None,
+}
+
+# Tier the canonical payload is fetched as, so it holds every field
+CANONICAL_TIER = UserTier.INTERNAL
+
+_reported_unmapped = set()
+
+def field_set_version(tier: UserTier) -> str:
+    """
+    Short hash of the fields `tier` may see, so ETags change when its projection does.
+    """
+    fields = TIER_FIELD_VISIBILITY.get(tier, ANONYMOUS_FIELDS)
+    if fields is None:
+        return "all"
+    return hashlib.sha1(",".join(sorted(fields)).encode()).hexdigest()[:8]
+
+def project_fields(content: Union[str, bytes], tier: UserTier) -> Union[str, bytes]:
+    """
+    Reduce a canonical property payload to the fields `tier` may see.
+    Anything but a JSON object is returned unchanged.
+    """
+    fields = TIER_FIELD_VISIBILITY.get(tier, ANONYMOUS_FIELDS)
+    if fields is None:
+        return content
+
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(payload, dict):
+        return content
+
+    # Fields the parser added since the map was last synced would otherwise vanish silently
+    unmapped = payload.keys() - MAPPED_FIELDS - _reported_unmapped
+    if unmapped:
+        _reported_unmapped.update(unmapped)
+        logger.warning("unmapped_property_fields", fields=sorted(unmapped))
+    return json.dumps({key: value for key, value in payload.items() if key in fields})
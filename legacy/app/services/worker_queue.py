@@ -1,60 +1,541 @@
 from redis.asyncio import Redis
+import asyncio
+import hashlib
 import json
+import random
+import time
 import structlog
-from typing import List, Optional
-from app.models.worker import WorkTask
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Iterable, List, Optional, Tuple
+from app.models.worker import WorkTask, TaskFailResponse, DeadLetter
+from app.services.queue_notifier import queue_notifier, QUEUE_NOTIFY_CHANNEL
+from app.services.queue_scheduler import QueueScheduler, default_scheduler
 
 logger = structlog.get_logger()
 
+# A claimed task must be completed (or its lease renewed) within this window,
+# otherwise the reaper puts it back on its queue. Matches the heartbeat TTL.
+LEASE_TIMEOUT_SECONDS = 300
+
+# Set of worker ids that currently hold leases, walked by the reaper
+LEASED_WORKERS_KEY = "processing:workers"
+
+# Failed tasks are retried with exponential backoff, then dead-lettered
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY_SECONDS = 30
+RETRY_MAX_DELAY_SECONDS = 3600
+
+RETRY_SCHEDULE_KEY = "retry:scheduled"  # payload -> due timestamp
+RETRY_ATTEMPTS_KEY = "retry:attempts"   # task_id -> failed attempts
+DEAD_LETTER_KEY = "dlq:tasks"           # task_id -> dead letter envelope
+
+# Bulk enqueue skips (platform, target) pairs that are already queued or in flight
+DEDUP_FINGERPRINTS_KEY = "dedup:fingerprints"  # set of fingerprints
+DEDUP_TASKS_KEY = "dedup:tasks"                # task_id -> fingerprint
+BULK_CHUNK_SIZE = 1000
+
+RETRY_KEYS = [RETRY_SCHEDULE_KEY, RETRY_ATTEMPTS_KEY, DEAD_LETTER_KEY, DEDUP_FINGERPRINTS_KEY, DEDUP_TASKS_KEY]
+
+# Long-polling workers re-check their queues at least this often while waiting
+WAIT_RECHECK_SECONDS = 5
+
+# Shared Lua helper pushing a task payload onto its queue (see _get_queue_key)
+# and notifying long-polling workers once per platform.
+# The queue key comes from the payload, so it is built inside the script rather
+# than declared in KEYS; this assumes a single Redis instance, not Redis Cluster.
+ENQUEUE_LUA = """
+local notified = {}
+local function enqueue(raw, command)
+    local task = cjson.decode(raw)
+    redis.call(command, 'queue:' .. task['platform'] .. ':p' .. (task['priority'] or 3), raw)
+    if not notified[task['platform']] then
+        notified[task['platform']] = true
+        redis.call('PUBLISH', '""" + QUEUE_NOTIFY_CHANNEL + """', task['platform'])
+    end
+end
+"""
+
+# Shared Lua helper releasing the dedup fingerprint of a finished task
+# dedup_keys - {fingerprints set, task_id -> fingerprint hash}
+RELEASE_FINGERPRINT_LUA = """
+local function release_fingerprint(dedup_keys, task_id)
+    local fingerprint = redis.call('HGET', dedup_keys[2], task_id)
+    if fingerprint then
+        redis.call('SREM', dedup_keys[1], fingerprint)
+        redis.call('HDEL', dedup_keys[2], task_id)
+    end
+end
+"""
+
+# Lua script for atomic batched claim
+# KEYS[1..n-4] - queue keys in the order given by the scheduler
+# KEYS[n-3] - processing list of the claiming worker
+# KEYS[n-2] - task_id -> payload index of the claiming worker
+# KEYS[n-1] - task_id -> lease deadline of the claiming worker
+# KEYS[n] - leased workers set
+# ARGV[1] - capacity (max tasks to claim)
+# ARGV[2] - lease deadline (unix timestamp)
+# ARGV[3] - worker_id
+# ARGV[4..] - first-pass quota of each queue key
+# Returns {claimed payloads, queue lengths left behind}
+CLAIM_TASKS_LUA = """
+local processing_key = KEYS[#KEYS - 3]
+local index_key = KEYS[#KEYS - 2]
+local leases_key = KEYS[#KEYS - 1]
+local leased_workers_key = KEYS[#KEYS]
+local queue_count = #KEYS - 4
+local capacity = tonumber(ARGV[1])
+local claimed = {}
+
+local function claim(queue_key, limit)
+    local taken = 0
+    while taken < limit and #claimed < capacity do
+        local raw = redis.call('RPOPLPUSH', queue_key, processing_key)
+        if not raw then
+            break
+        end
+        local task_id = cjson.decode(raw)['task_id']
+        redis.call('HSET', index_key, task_id, raw)
+        redis.call('ZADD', leases_key, ARGV[2], task_id)
+        claimed[#claimed + 1] = raw
+        taken = taken + 1
+    end
+end
+
+-- First pass honours each queue's quota, second pass fills what is left in order
+for i = 1, queue_count do
+    claim(KEYS[i], tonumber(ARGV[3 + i]))
+end
+for i = 1, queue_count do
+    claim(KEYS[i], capacity)
+end
+
+local backlog = {}
+for i = 1, queue_count do
+    backlog[i] = redis.call('LLEN', KEYS[i])
+end
+
+if #claimed > 0 then
+    redis.call('SADD', leased_workers_key, ARGV[3])
+end
+return {claimed, backlog}
+"""
+
+# Lua script for atomic task completion
+# KEYS[1] - processing list of the worker
+# KEYS[2] - task_id -> payload index of the worker
+# KEYS[3] - task_id -> lease deadline of the worker
+# KEYS[4] - task_id -> failed attempts
+# KEYS[5..6] - dedup fingerprints set and task_id -> fingerprint hash
+# ARGV[1] - task_id
+COMPLETE_TASK_LUA = RELEASE_FINGERPRINT_LUA + """
+local raw = redis.call('HGET', KEYS[2], ARGV[1])
+if not raw then
+    return 0
+end
+
+-- Claims are pushed to the head, so the oldest in-flight tasks sit at the tail
+redis.call('LREM', KEYS[1], -1, raw)
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+release_fingerprint({KEYS[5], KEYS[6]}, ARGV[1])
+return 1
+"""
+
+# Shared Lua helper scheduling a retry for a released task, or dead-lettering it
+# retry_keys - {retry schedule, task_id -> failed attempts, dead letter hash,
+#               dedup fingerprints set, task_id -> fingerprint hash}
+# ARGV[1] - task_id
+# ARGV[2] - current timestamp
+# ARGV[3] - base delay (seconds)
+# ARGV[4] - max delay (seconds)
+# ARGV[5] - max attempts
+# ARGV[6] - jitter factor in [0, 1)
+# ARGV[7] - error message
+RETRY_OR_DEAD_LETTER_LUA = RELEASE_FINGERPRINT_LUA + """
+local function retry_or_dead_letter(retry_keys, raw)
+    local now = tonumber(ARGV[2])
+    local attempts = redis.call('HINCRBY', retry_keys[2], ARGV[1], 1)
+    if attempts >= tonumber(ARGV[5]) then
+        redis.call('HSET', retry_keys[3], ARGV[1], cjson.encode({
+            task = raw, error = ARGV[7], attempts = attempts, failed_at = now
+        }))
+        redis.call('HDEL', retry_keys[2], ARGV[1])
+        release_fingerprint({retry_keys[4], retry_keys[5]}, ARGV[1])
+        return {2, attempts, 0}
+    end
+
+    -- Exponential backoff with equal jitter: half fixed, half random
+    local delay = math.min(tonumber(ARGV[4]), tonumber(ARGV[3]) * 2 ^ (attempts - 1))
+    delay = delay / 2 + delay / 2 * tonumber(ARGV[6])
+    redis.call('ZADD', retry_keys[1], now + delay, raw)
+    return {1, attempts, math.floor(delay)}
+end
+"""
+
+# Lua script for failing a task: schedule a retry or dead-letter it
+# KEYS[1..3] - processing list, payload index and leases of the worker
+# KEYS[4..8] - retry keys, see RETRY_OR_DEAD_LETTER_LUA
+# ARGV - see RETRY_OR_DEAD_LETTER_LUA
+FAIL_TASK_LUA = RETRY_OR_DEAD_LETTER_LUA + """
+local raw = redis.call('HGET', KEYS[2], ARGV[1])
+if not raw then
+    return {0, 0, 0}
+end
+
+redis.call('LREM', KEYS[1], -1, raw)
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+
+return retry_or_dead_letter({KEYS[4], KEYS[5], KEYS[6], KEYS[7], KEYS[8]}, raw)
+"""
+
+# Lua script for deduplicated bulk enqueue
+# KEYS[1] - dedup fingerprints set
+# KEYS[2] - task_id -> fingerprint hash
+# ARGV - (task_id, fingerprint, payload) triples
+BULK_ENQUEUE_LUA = ENQUEUE_LUA + """
+local queued = 0
+for i = 1, #ARGV, 3 do
+    if redis.call('SADD', KEYS[1], ARGV[i + 1]) == 1 then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+        enqueue(ARGV[i + 2], 'LPUSH')
+        queued = queued + 1
+    end
+end
+return queued
+"""
+
+# Lua script for moving due retries back to their queues
+# KEYS[1] - retry schedule
+# ARGV[1] - current timestamp
+# ARGV[2] - max tasks to promote
+PROMOTE_RETRIES_LUA = ENQUEUE_LUA + """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, raw in ipairs(due) do
+    enqueue(raw, 'LPUSH')
+    redis.call('ZREM', KEYS[1], raw)
+end
+return #due
+"""
+
+# Lua script for replaying a dead-lettered task
+# KEYS[1] - dead letter hash
+# KEYS[2] - dedup fingerprints set
+# KEYS[3] - task_id -> fingerprint hash
+# ARGV[1] - task_id
+# ARGV[2] - fingerprint of the task
+# Returns 0 if not dead-lettered, 1 if re-queued, 2 if the same target was queued meanwhile
+REPLAY_DEAD_LETTER_LUA = ENQUEUE_LUA + """
+local envelope = redis.call('HGET', KEYS[1], ARGV[1])
+if not envelope then
+    return 0
+end
+
+redis.call('HDEL', KEYS[1], ARGV[1])
+-- Dead-lettering released the fingerprint; take it again like a bulk enqueue
+if redis.call('SADD', KEYS[2], ARGV[2]) == 0 then
+    return 2
+end
+redis.call('HSET', KEYS[3], ARGV[1], ARGV[2])
+enqueue(cjson.decode(envelope)['task'], 'LPUSH')
+return 1
+"""
+
+# Lua script for extending all leases of a worker
+# KEYS[1] - task_id -> lease deadline of the worker
+# ARGV[1] - new lease deadline (unix timestamp)
+RENEW_LEASES_LUA = """
+local task_ids = redis.call('ZRANGE', KEYS[1], 0, -1)
+for _, task_id in ipairs(task_ids) do
+    redis.call('ZADD', KEYS[1], 'XX', ARGV[1], task_id)
+end
+return #task_ids
+"""
+
+# Lua script for re-queueing expired leases of a worker
+# KEYS[1] - processing list of the worker
+# KEYS[2] - task_id -> payload index of the worker
+# KEYS[3] - task_id -> lease deadline of the worker
+# KEYS[4] - leased workers set
+# ARGV[1] - current timestamp
+# ARGV[2] - max tasks to re-queue
+# ARGV[3] - worker_id
+REAP_LEASES_LUA = ENQUEUE_LUA + """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+
+for _, task_id in ipairs(expired) do
+    local raw = redis.call('HGET', KEYS[2], task_id)
+    if raw then
+        -- RPUSH puts the task at the consuming end so it is picked up next
+        enqueue(raw, 'RPUSH')
+        redis.call('LREM', KEYS[1], -1, raw)
+        redis.call('HDEL', KEYS[2], task_id)
+    end
+    redis.call('ZREM', KEYS[3], task_id)
+end
+
+if redis.call('ZCARD', KEYS[3]) == 0 then
+    redis.call('SREM', KEYS[4], ARGV[3])
+end
+return #expired
+"""
+
 class WorkerQueue:
-    def __init__(self, redis: Redis):
+    def __init__(self, redis: Redis, scheduler: Optional[QueueScheduler] = None):
         self.redis = redis
+        self.scheduler = scheduler or default_scheduler
+        self._scripts = {}
+
+    def _get_script(self, lua: str):
+        if lua not in self._scripts:
+            self._scripts[lua] = self.redis.register_script(lua)
+        return self._scripts[lua]
 
     def _get_queue_key(self, platform: str, priority: int) -> str:
         return f"queue:{platform}:p{priority}"
 
     def _get_processing_key(self, worker_id: str) -> str:
+        # Kept alongside the index: the Go queue (internal/service/queue.go) shares
+        # this Redis and still claims into and completes from this list
         return f"processing:{worker_id}"
 
-    async def push_task(self, task: WorkTask):
-        key = self._get_queue_key(task.platform, task.priority)
-        await self.redis.lpush(key, task.model_dump_json())
-        logger.info("task_pushed", task_id=task.task_id, platform=task.platform)
+    def _get_index_key(self, worker_id: str) -> str:
+        return f"processing:{worker_id}:tasks"
 
-    async def pop_tasks(self, worker_id: str, platforms: List[str], capacity: int) -> List[WorkTask]:
-        tasks = []
-        # Try platforms in order
-        for platform in platforms:
-            if len(tasks) >= capacity:
-                break
-                
-            # Try priorities from 1 (urgent) to 4 (low)
-            for priority in range(1, 5):
-                if len(tasks) >= capacity:
-                    break
-                    
-                queue_key = self._get_queue_key(platform, priority)
-                processing_key = self._get_processing_key(worker_id)
-                
-                # Reliable queue pattern: RPOPLPUSH
-                raw_task = await self.redis.rpoplpush(queue_key, processing_key)
-                if raw_task:
-                    task_data = json.loads(raw_task)
-                    tasks.append(WorkTask(**task_data))
-                    logger.info("task_popped", worker_id=worker_id, task_id=task_data["task_id"])
-                    
+    def _get_leases_key(self, worker_id: str) -> str:
+        return f"processing:{worker_id}:leases"
+
+    def _get_worker_keys(self, worker_id: str) -> List[str]:
+        return [
+            self._get_processing_key(worker_id),
+            self._get_index_key(worker_id),
+            self._get_leases_key(worker_id),
+        ]
+
+    async def push_task(self, task: WorkTask) -> bool:
+        """
+        Enqueue a single task unless its (platform, target) is already queued or in flight.
+        """
+        queued = await self._get_script(BULK_ENQUEUE_LUA)(
+            keys=[DEDUP_FINGERPRINTS_KEY, DEDUP_TASKS_KEY],
+            args=[task.task_id, self._get_fingerprint(task), task.model_dump_json()]
+        )
+        if queued:
+            logger.info("task_pushed", task_id=task.task_id, platform=task.platform)
+        else:
+            logger.info("task_push_duplicate", task_id=task.task_id, platform=task.platform)
+        return bool(queued)
+
+    def _get_fingerprint(self, task: WorkTask) -> str:
+        target = json.dumps(task.target, sort_keys=True, default=str)
+        return hashlib.sha1(f"{task.platform}:{target}".encode()).hexdigest()
+
+    async def push_tasks(self, tasks: Iterable[WorkTask], chunk_size: int = BULK_CHUNK_SIZE) -> tuple[int, int]:
+        """
+        Enqueue many tasks, skipping those whose (platform, target) is already
+        queued or in flight. Chunks are deduplicated and pushed atomically by a
+        script and all chunks are sent in one pipeline.
+        Returns (queued, duplicates).
+        """
+        script = self._get_script(BULK_ENQUEUE_LUA)
+        tasks = iter(tasks)
+        total = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            while chunk := list(islice(tasks, chunk_size)):
+                args = []
+                for task in chunk:
+                    args.extend([task.task_id, self._get_fingerprint(task), task.model_dump_json()])
+                await script(keys=[DEDUP_FINGERPRINTS_KEY, DEDUP_TASKS_KEY], args=args, client=pipe)
+                total += len(chunk)
+            queued = sum(await pipe.execute())
+
+        logger.info("tasks_bulk_pushed", queued=queued, duplicates=total - queued)
+        return queued, total - queued
+
+    async def pop_tasks(
+        self, worker_id: str, platforms: List[str], capacity: int, wait: float = 0
+    ) -> List[WorkTask]:
+        """
+        Claim up to `capacity` tasks in a single round trip.
+        The scheduler decides how capacity is shared across platforms and priorities.
+        Each claimed task gets a lease of LEASE_TIMEOUT_SECONDS.
+        With `wait`, blocks up to that many seconds until tasks arrive.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            events = queue_notifier.watch(platforms)
+            tasks = await self._claim_tasks(worker_id, platforms, capacity)
+            remaining = deadline - loop.time()
+            if tasks or remaining <= 0:
+                return tasks
+            await queue_notifier.wait(events, timeout=min(remaining, WAIT_RECHECK_SECONDS))
+
+    async def _claim_tasks(self, worker_id: str, platforms: List[str], capacity: int) -> List[WorkTask]:
+        slots = self.scheduler.plan(platforms, capacity)
+        queue_keys = [self._get_queue_key(slot.platform, slot.priority) for slot in slots]
+
+        # Reliable queue pattern: RPOPLPUSH, executed server-side
+        raw_tasks, backlog = await self._get_script(CLAIM_TASKS_LUA)(
+            keys=[*queue_keys, *self._get_worker_keys(worker_id), LEASED_WORKERS_KEY],
+            args=[capacity, time.time() + LEASE_TIMEOUT_SECONDS, worker_id,
+                  *[slot.quota for slot in slots]]
+        )
+
+        tasks = [WorkTask(**json.loads(raw_task)) for raw_task in raw_tasks]
+        claimed = Counter((task.platform, task.priority) for task in tasks)
+        self.scheduler.record(slots, claimed, backlog)
+
+        if tasks:
+            logger.info("tasks_popped", worker_id=worker_id, count=len(tasks),
+                        task_ids=[task.task_id for task in tasks])
         return tasks
 
-    async def complete_task(self, worker_id: str, task_id: str):
-        # In a real implementation, we'd need to find the specific task in the processing list
-        # For simplicity in MVP, we'll assume the processing list is short
-        processing_key = self._get_processing_key(worker_id)
-        # This is a bit naive but works for the MVP logic
-        tasks = await self.redis.lrange(processing_key, 0, -1)
-        for raw_task in tasks:
-            task_data = json.loads(raw_task)
-            if task_data["task_id"] == task_id:
-                await self.redis.lrem(processing_key, 1, raw_task)
-                logger.info("task_completed", worker_id=worker_id, task_id=task_id)
-                return True
-        return False
+    def _complete_call(self, worker_id: str, task_id: str):
+        return self._get_script(COMPLETE_TASK_LUA), {
+            "keys": [*self._get_worker_keys(worker_id), RETRY_ATTEMPTS_KEY,
+                     DEDUP_FINGERPRINTS_KEY, DEDUP_TASKS_KEY],
+            "args": [task_id]
+        }
+
+    async def complete_task(self, worker_id: str, task_id: str) -> bool:
+        """
+        Remove a finished task from the worker's processing list.
+        The payload is looked up by task_id in the index, in a single round trip.
+        """
+        script, call = self._complete_call(worker_id, task_id)
+        removed = await script(**call)
+        if removed:
+            logger.info("task_completed", worker_id=worker_id, task_id=task_id)
+        return bool(removed)
+
+    async def complete_tasks(self, completions: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Complete many (worker_id, task_id) pairs in one pipelined round trip.
+        """
+        if not completions:
+            return []
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for worker_id, task_id in completions:
+                script, call = self._complete_call(worker_id, task_id)
+                await script(**call, client=pipe)
+            removed = await pipe.execute()
+
+        logger.info("tasks_completed", count=sum(1 for r in removed if r), requested=len(completions))
+        return [bool(r) for r in removed]
+
+    async def fail_task(self, worker_id: str, task_id: str, error: Optional[str] = None) -> TaskFailResponse:
+        """
+        Release a failed task from the worker. It is scheduled for a retry with
+        exponential backoff, or dead-lettered after MAX_ATTEMPTS.
+        """
+        result = await self._get_script(FAIL_TASK_LUA)(
+            keys=[*self._get_worker_keys(worker_id), *RETRY_KEYS],
+            args=self._get_retry_args(task_id, error)
+        )
+        return self._fail_response(worker_id, task_id, error, result)
+
+    def _get_retry_args(self, task_id: str, error: Optional[str]) -> list:
+        return [task_id, time.time(), RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS,
+                MAX_ATTEMPTS, random.random(), error or ""]
+
+    def _fail_response(self, worker_id: str, task_id: str, error: Optional[str], result: list) -> TaskFailResponse:
+        status, attempts, retry_in = result
+        if status == 0:
+            return TaskFailResponse(status="not_found")
+        if status == 2:
+            logger.error("task_dead_lettered", worker_id=worker_id, task_id=task_id, attempts=attempts, error=error)
+            return TaskFailResponse(status="dead_lettered", attempts=attempts)
+
+        logger.warning("task_retry_scheduled", worker_id=worker_id, task_id=task_id,
+                       attempts=attempts, retry_in=retry_in, error=error)
+        return TaskFailResponse(status="retry_scheduled", attempts=attempts, retry_in=retry_in)
+
+    async def promote_retries(self, limit: int = 500) -> int:
+        """
+        Move up to `limit` due retries back to their priority queues.
+        """
+        return await self._get_script(PROMOTE_RETRIES_LUA)(
+            keys=[RETRY_SCHEDULE_KEY],
+            args=[time.time(), limit]
+        )
+
+    async def list_dead_letters(self, limit: int = 100) -> tuple[int, List[DeadLetter]]:
+        """
+        Return the dead letter count and up to `limit` entries.
+        """
+        total = await self.redis.hlen(DEAD_LETTER_KEY)
+        dead_letters = []
+        async for _, envelope in self.redis.hscan_iter(DEAD_LETTER_KEY, count=limit):
+            data = json.loads(envelope)
+            dead_letters.append(DeadLetter(
+                task=WorkTask(**json.loads(data["task"])),
+                error=data["error"] or None,
+                attempts=data["attempts"],
+                failed_at=datetime.utcfromtimestamp(data["failed_at"])
+            ))
+            if len(dead_letters) >= limit:
+                break
+        return total, dead_letters
+
+    async def replay_dead_letter(self, task_id: str) -> bool:
+        """
+        Put a dead-lettered task back on its queue with a fresh attempt count.
+        If its (platform, target) was queued again meanwhile, the dead letter is
+        dropped instead of queueing a duplicate.
+        """
+        envelope = await self.redis.hget(DEAD_LETTER_KEY, task_id)
+        if envelope is None:
+            return False
+        task = WorkTask(**json.loads(json.loads(envelope)["task"]))
+
+        replayed = await self._get_script(REPLAY_DEAD_LETTER_LUA)(
+            keys=[DEAD_LETTER_KEY, DEDUP_FINGERPRINTS_KEY, DEDUP_TASKS_KEY],
+            args=[task_id, self._get_fingerprint(task)]
+        )
+        if replayed == 1:
+            logger.info("dead_letter_replayed", task_id=task_id)
+        elif replayed == 2:
+            logger.info("dead_letter_replay_duplicate", task_id=task_id)
+        return bool(replayed)
+
+    async def renew_leases(self, worker_id: str) -> int:
+        """
+        Extend the leases of every task held by a live worker.
+        """
+        return await self._get_script(RENEW_LEASES_LUA)(
+            keys=[self._get_leases_key(worker_id)],
+            args=[time.time() + LEASE_TIMEOUT_SECONDS]
+        )
+
+    async def reap_expired_leases(self, limit: int = 500) -> int:
+        """
+        Move tasks whose lease expired back to their queues.
+        All leased workers are handled in one pipelined round trip.
+        """
+        worker_ids = list(await self.redis.smembers(LEASED_WORKERS_KEY))
+        if not worker_ids:
+            return 0
+
+        script = self._get_script(REAP_LEASES_LUA)
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for worker_id in worker_ids:
+                await script(
+                    keys=[*self._get_worker_keys(worker_id), LEASED_WORKERS_KEY],
+                    args=[now, limit, worker_id],
+                    client=pipe
+                )
+            counts = await pipe.execute()
+
+        requeued = 0
+        for worker_id, count in zip(worker_ids, counts):
+            if count:
+                requeued += count
+                logger.warning("task_leases_expired", worker_id=worker_id, count=count)
+        return requeued
@@ -0,0 +1,42 @@
+import os
+import pytest
+import pytest_asyncio
+from typing import Optional
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError
+from app.models.worker import ParcelResult
+
+def parcel_result(task_id: str, parcel_id: Optional[str] = None, **fields) -> ParcelResult:
+    values = {
+        "task_id": task_id,
+        "parcel_id": parcel_id or f"parcel-{task_id}",
+        "platform": "beacon",
+        "state": "FL",
+        "county": "Orange",
+        "data": {"owner": "test"},
+        "parse_duration_ms": 10,
+    }
+    values.update(fields)
+    return ParcelResult(**values)
+
+@pytest.fixture
+def make_result():
+    """
+    Factory for worker results: make_result(task_id, parcel_id=None, **fields).
+    """
+    return parcel_result
+
+@pytest_asyncio.fixture
+async def live_redis():
+    # Lua scripts need a real server; point this at a disposable database
+    url = os.getenv("REDIS_TEST_URL")
+    if not url:
+        pytest.skip("REDIS_TEST_URL not set")
+    redis = Redis.from_url(url, decode_responses=True)
+    try:
+        await redis.flushdb()
+    except ConnectionError:
+        pytest.skip("Redis at REDIS_TEST_URL unreachable")
+    yield redis
+    await redis.flushdb()
+    await redis.aclose()
@@ -0,0 +1,309 @@
+import pytest
+import json
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+from starlette.datastructures import QueryParams
+from app.core.metrics import CACHE_REQUESTS
+from app.core.response_cache import ResponseCache
+from app.services import cache
+from app.services.cache import (
+    CacheService, CacheInvalidationListener, CachePolicy, LocalCache, Uncacheable,
+    CACHE_INVALIDATION_CHANNEL, COMPRESSED_MARKER, encode_cached_response, decode_cached_response
+)
+from app.models.auth import UserTier
+
+@pytest.fixture
+def mock_redis():
+    redis = AsyncMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock()
+    redis.pipeline = MagicMock()
+    redis.pipeline.return_value.__aenter__.return_value = pipe
+    return redis
+
+@pytest.mark.asyncio
+async def test_invalidate_properties_all_tiers(mock_redis, monkeypatch):
+    monkeypatch.setattr(cache, "INVALIDATION_REPEAT_SECONDS", 0)
+    pipe = mock_redis.pipeline.return_value.__aenter__.return_value
+
+    await CacheService(mock_redis).invalidate_properties(["p2", "p1", "p1"])
+
+    unlinked = [key for call in pipe.unlink.call_args_list for key in call.args]
+    assert len(unlinked) == 2 * (len(UserTier) + 1)
+    assert "cache:prop:p1" in unlinked
+    assert "cache:prop:p1:premium" in unlinked
+    assert "cache:prop:p2:anonymous" in unlinked
+    mock_redis.publish.assert_called_once_with(CACHE_INVALIDATION_CHANNEL, json.dumps(["p1", "p2"]))
+
+@pytest.mark.asyncio
+async def test_invalidate_properties_nothing_changed(mock_redis):
+    await CacheService(mock_redis).invalidate_properties([])
+
+    mock_redis.pipeline.assert_not_called()
+    mock_redis.publish.assert_not_called()
+
+def test_local_cache_evicts_least_recently_used():
+    local = LocalCache(max_entries=2)
+    local.set("a", "1")
+    local.set("b", "2")
+    local.get("a")
+    local.set("c", "3")
+
+    assert local.get("b") is None
+    assert local.get("a") == "1" and local.get("c") == "3"
+
+def test_local_cache_byte_limit():
+    local = LocalCache(max_bytes=8)
+    local.set("a", "1234")
+    local.set("b", "1234")
+    # Larger than the whole tier, never stored
+    local.set("c", "x" * 20)
+
+    assert local.get("a") is None
+    assert local.get("b") == "1234"
+    assert local.get("c") is None
+    assert local.size_bytes == 5
+
+def test_local_cache_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    local = LocalCache(ttl=60)
+    local.set("a", "1", ttl=5)
+    now[0] += 6
+
+    assert local.get("a") is None
+    assert len(local) == 0
+
+@pytest.mark.asyncio
+async def test_get_reads_through_local_tier(mock_redis):
+    mock_redis.get.return_value = '{"owner": "John"}'
+    service = CacheService(mock_redis, local=LocalCache())
+
+    assert await service.get("cache:prop:p1:free") == {"owner": "John"}
+    assert await service.get("cache:prop:p1:free") == {"owner": "John"}
+    mock_redis.get.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_invalidation_message_evicts_local_tier():
+    local = LocalCache()
+    local.set("cache:prop:p1:free", "{}")
+    local.set("cache:prop:p1:premium", "{}")
+    local.set("cache:prop:p2:free", "{}")
+
+    CacheInvalidationListener(local).handle(json.dumps(["p1"]))
+
+    assert local.get("cache:prop:p1:free") is None
+    assert local.get("cache:prop:p1:premium") is None
+    assert local.get("cache:prop:p2:free") == "{}"
+
+POLICY = CachePolicy(soft_ttl=60, hard_ttl=3600, negative_ttl=30)
+
+@pytest.mark.asyncio
+async def test_get_response_coalesces_misses(mock_redis):
+    mock_redis.get.return_value = None
+    mock_redis.set.return_value = True
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 200, b'{"owner": "John"}'
+
+    service = CacheService(mock_redis, local=None)
+    results = await asyncio.gather(*[
+        service.get_response("cache:prop:p1:free", loader, POLICY) for _ in range(10)
+    ])
+
+    assert calls == 1
+    assert all(cached.content == '{"owner": "John"}' and status == "MISS" for cached, status in results)
+    mock_redis.setex.assert_called_once()
+    # The fill lock is released afterwards
+    mock_redis.eval.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_get_response_waits_for_other_process(mock_redis, monkeypatch):
+    monkeypatch.setattr(cache, "FILL_LOCK_POLL_SECONDS", 0)
+    filled = encode_cached_response(200, '{"owner": "John"}', time.time() + 60)
+    # Missing at first, then filled by the process holding the lock
+    mock_redis.get.side_effect = [None, None, filled]
+    mock_redis.set.return_value = None
+    mock_redis.exists.return_value = 1
+    loader = AsyncMock()
+
+    cached, status = await CacheService(mock_redis, local=None).get_response("cache:prop:p1:free", loader, POLICY)
+
+    assert cached.content == '{"owner": "John"}' and status == "MISS"
+    loader.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_response_serves_stale_and_refreshes(mock_redis):
+    mock_redis.get.return_value = encode_cached_response(200, '{"v": 1}', time.time() - 1)
+    mock_redis.set.return_value = True
+    loader = AsyncMock(return_value=(200, b'{"v": 2}'))
+    service = CacheService(mock_redis, local=None)
+
+    cached, status = await service.get_response("cache:prop:p1:free", loader, POLICY)
+    assert status == "STALE" and cached.content == '{"v": 1}'
+
+    # Let the background refresh run; it found the entry still stale after locking
+    await asyncio.sleep(0.01)
+    loader.assert_called_once()
+    key, ttl, data = mock_redis.setex.call_args.args
+    assert ttl == POLICY.hard_ttl
+    refreshed = decode_cached_response(data)
+    assert refreshed.content == '{"v": 2}' and refreshed.is_fresh()
+
+@pytest.mark.asyncio
+async def test_stale_local_copy_defers_to_refresh_by_other_process(live_redis):
+    key = "cache:prop:p1:free"
+    loader = AsyncMock(return_value=(200, b'{"v": 2}'))
+    process_a = CacheService(live_redis, local=LocalCache())
+    process_b = CacheService(live_redis, local=LocalCache())
+    await process_a.set_raw(key, encode_cached_response(200, '{"v": 1}', time.time() - 1))
+    # Both processes hold the stale copy locally
+    await process_b.get_raw(key)
+
+    cached, status = await process_a.get_response(key, loader, POLICY)
+    assert status == "STALE"
+    await asyncio.sleep(0.05)
+
+    cached, status = await process_b.get_response(key, loader, POLICY)
+    assert status == "HIT" and cached.content == '{"v": 2}'
+    loader.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_get_response_caches_not_found_briefly(mock_redis):
+    mock_redis.get.return_value = None
+    mock_redis.set.return_value = True
+    loader = AsyncMock(return_value=(404, b'{"detail": "Not found"}'))
+
+    cached, status = await CacheService(mock_redis, local=None).get_response("cache:prop:p1:free", loader, POLICY)
+
+    assert status == "MISS" and cached.status_code == 404
+    _, ttl, data = mock_redis.setex.call_args.args
+    assert ttl == POLICY.negative_ttl
+    assert decode_cached_response(data).status_code == 404
+
+@pytest.mark.asyncio
+async def test_get_response_does_not_cache_errors(mock_redis):
+    mock_redis.get.return_value = None
+    mock_redis.set.return_value = True
+    loader = AsyncMock(return_value=(500, b"boom"))
+
+    with pytest.raises(Uncacheable) as e:
+        await CacheService(mock_redis, local=None).get_response("cache:prop:p1:free", loader, POLICY)
+    assert e.value.result.status_code == 500
+    mock_redis.setex.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_get_response_passes_non_utf8_body_through(mock_redis):
+    mock_redis.get.return_value = None
+    mock_redis.set.return_value = True
+    loader = AsyncMock(return_value=(200, b"\xff\xfe{}"))
+
+    with pytest.raises(Uncacheable) as e:
+        await CacheService(mock_redis, local=None).get_response("cache:prop:p1:free", loader, POLICY)
+    assert e.value.result.status_code == 200
+    assert e.value.result.content == b"\xff\xfe{}"
+    mock_redis.setex.assert_not_called()
+
+def test_decode_bare_body_as_fresh():
+    cached = decode_cached_response(b'{"v": 1}')
+
+    assert cached.status_code == 200 and cached.content == '{"v": 1}' and cached.is_fresh()
+
+def make_request(query: str, tier: UserTier = UserTier.FREE, headers: dict = None):
+    request = MagicMock()
+    request.query_params = QueryParams(query)
+    request.headers = headers or {}
+    request.state.auth.tier = tier
+    return request
+
+def test_response_cache_normalizes_query(mock_redis):
+    service = CacheService(mock_redis, local=None)
+    key = ResponseCache(service, "search_owner", POLICY, make_request("owner=Smith&state=FL")).key()
+
+    assert ResponseCache(service, "search_owner", POLICY, make_request("state=FL&owner=%20Smith&page=")).key() == key
+    assert ResponseCache(service, "search_owner", POLICY, make_request("owner=Smith&state=GA")).key() != key
+    # Tiers may see different fields
+    assert ResponseCache(service, "search_owner", POLICY, make_request("owner=Smith&state=FL", UserTier.PREMIUM)).key() != key
+
+@pytest.mark.asyncio
+async def test_response_cache_counts_results(mock_redis):
+    mock_redis.get.return_value = None
+    mock_redis.set.return_value = True
+    response_cache = ResponseCache(CacheService(mock_redis, local=None), "top_list", POLICY, make_request("limit=10"))
+    misses = CACHE_REQUESTS.labels(route="top_list", result="miss")._value.get()
+
+    response = await response_cache.respond(AsyncMock(return_value=(200, b"[]")), identifier="hot")
+
+    assert response.status_code == 200 and response.headers["X-Cache"] == "MISS"
+    assert CACHE_REQUESTS.labels(route="top_list", result="miss")._value.get() == misses + 1
+
+def test_response_cache_fetches_as_gateway(mock_redis):
+    request = make_request("", tier=UserTier.STARTER)
+    request.state.auth.user_id = "user-42"
+    response_cache = ResponseCache(CacheService(mock_redis, local=None), "search_address", POLICY, request)
+
+    # The entry is shared by every starter user, so the requester's ID is not sent
+    assert response_cache.upstream_headers() == {"X-User-ID": "gateway", "X-User-Tier": "starter"}
+    assert response_cache.upstream_headers(UserTier.INTERNAL)["X-User-Tier"] == "internal"
+
+@pytest.mark.asyncio
+async def test_large_values_stored_compressed(mock_redis):
+    value = json.dumps([{"owner": "John Smith", "county": "Orange", "amount": i} for i in range(200)])
+    service = CacheService(mock_redis, local=None)
+
+    await service.set_raw("cache:prop:p1:free", value, 60)
+
+    _, _, stored = mock_redis.setex.call_args.args
+    assert stored.startswith(COMPRESSED_MARKER)
+    assert len(stored) < len(value) / 4
+    mock_redis.get.return_value = stored
+    assert await service.get_raw("cache:prop:p1:free") == value
+
+@pytest.mark.asyncio
+async def test_small_and_uncompressed_values_read_as_is(mock_redis):
+    service = CacheService(mock_redis, local=None)
+
+    await service.set_raw("cache:prop:p1:free", '{"v": 1}', 60)
+
+    mock_redis.setex.assert_called_once_with("cache:prop:p1:free", 60, '{"v": 1}')
+    mock_redis.get.return_value = encode_cached_response(200, '{"v": 1}', 0)
+    assert decode_cached_response(await service.get_raw("cache:prop:p1:free")).content == '{"v": 1}'
+
+@pytest.mark.asyncio
+async def test_response_cache_answers_matching_etag(mock_redis):
+    mock_redis.get.return_value = encode_cached_response(200, '{"v": 1}', time.time() + 60)
+    service = CacheService(mock_redis, local=None)
+    response = await ResponseCache(service, "top_list", POLICY, make_request("")).respond(AsyncMock())
+    etag = response.headers["ETag"]
+    transform = MagicMock()
+
+    not_modified = await ResponseCache(
+        service, "top_list", POLICY, make_request("", headers={"if-none-match": f'"other", W/{etag}'})
+    ).respond(AsyncMock(), transform=transform)
+
+    assert not_modified.status_code == 304 and not_modified.body == b""
+    assert not_modified.headers["ETag"] == etag
+    transform.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_response_cache_etag_per_variant(mock_redis):
+    mock_redis.get.return_value = encode_cached_response(200, '{"v": 1}', time.time() + 60)
+    service = CacheService(mock_redis, local=None)
+    request = make_request("", headers={"if-none-match": decode_cached_response(mock_redis.get.return_value).etag})
+
+    response = await ResponseCache(service, "property", POLICY, request).respond(AsyncMock(), variant="free")
+
+    # The canonical ETag does not match a projection of it
+    assert response.status_code == 200
+    assert response.headers["ETag"].endswith('-free"')
+
+def test_etag_stored_with_response():
+    cached = decode_cached_response(encode_cached_response(200, '{"v": 1}', 0))
+
+    assert cached.etag == decode_cached_response('{"v": 1}').etag
+    assert decode_cached_response(encode_cached_response(404, "{}", 0)).etag is None
@@ -0,0 +1,135 @@
+import pytest
+import asyncio
+import httpx
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services import http_client
+from app.services.http_client import (
+    CircuitState, HTTPClientManager, RedisCircuitBreaker, RetryBudget, ServiceClient, http_clients
+)
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http_client, "retry_backoff", lambda attempt: 0)
+    service = ServiceClient("http://retry-service", "retry-test")
+    service.budget.tokens = 5
+    service.breaker.record_success()
+    yield service
+    service.latency.samples.clear()
+
+@pytest.mark.asyncio
+async def test_service_clients_share_pooled_client():
+    ok = httpx.Response(200)
+    with patch("httpx.AsyncClient.request", new_callable=AsyncMock, return_value=ok) as mock_request:
+        await ServiceClient("http://pooled-service", "pooled").request("GET", "/a")
+        await ServiceClient("http://pooled-service", "pooled").request("GET", "/b")
+
+    assert mock_request.call_count == 2
+    assert http_clients.get("http://pooled-service") is http_clients.get("http://pooled-service")
+    await http_clients.close()
+
+@pytest.mark.asyncio
+async def test_close_replaces_clients():
+    manager = HTTPClientManager()
+    client = manager.get("http://service")
+
+    await manager.close()
+
+    assert client.is_closed
+    assert manager.get("http://service") is not client
+    await manager.close()
+
+@pytest.mark.asyncio
+async def test_get_retried_on_gateway_error(client):
+    responses = [httpx.Response(503), httpx.ConnectError("refused"), httpx.Response(200)]
+    with patch("httpx.AsyncClient.request", new_callable=AsyncMock, side_effect=responses) as mock_request:
+        response = await client.request("GET", "/parcels")
+
+    assert response.status_code == 200
+    assert mock_request.call_count == 3
+    assert client.breaker.failures == 0
+
+@pytest.mark.asyncio
+async def test_post_not_retried(client):
+    with patch("httpx.AsyncClient.request", new_callable=AsyncMock, return_value=httpx.Response(503)) as mock_request:
+        response = await client.request("POST", "/predict")
+
+    assert response.status_code == 503
+    assert mock_request.call_count == 1
+
+@pytest.mark.asyncio
+async def test_retries_stop_when_budget_spent(client):
+    client.budget.tokens = 0
+    client.budget.min_per_second = 0
+    with patch("httpx.AsyncClient.request", new_callable=AsyncMock, side_effect=httpx.ConnectError("refused")) as mock_request:
+        with pytest.raises(httpx.ConnectError):
+            await client.request("GET", "/parcels")
+
+    assert mock_request.call_count == 1
+    assert client.breaker.failures == 1
+
+def test_retry_budget_earned_by_requests():
+    budget = RetryBudget(ratio=0.5, min_per_second=0)
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+@pytest.mark.asyncio
+async def test_hedged_get_takes_first_response(client):
+    client.hedge = True
+    for _ in range(http_client.HEDGE_MIN_SAMPLES):
+        client.latency.record(0.01)
+    slow, fast = httpx.Response(200, text="slow"), httpx.Response(200, text="fast")
+
+    async def upstream(**kwargs):
+        if upstream.calls == 0:
+            upstream.calls += 1
+            await asyncio.sleep(1)
+            return slow
+        return fast
+    upstream.calls = 0
+
+    with patch("httpx.AsyncClient.request", side_effect=upstream):
+        response = await client.request("GET", "/parcels")
+
+    assert response.text == "fast"
+
+def shared_breaker(*script_results):
+    redis = MagicMock()
+    script = AsyncMock(side_effect=list(script_results))
+    redis.register_script = MagicMock(return_value=script)
+    return RedisCircuitBreaker("shared-test", redis), script
+
+@pytest.mark.asyncio
+async def test_shared_breaker_blocks_when_open_elsewhere():
+    breaker, script = shared_breaker(["open", 0])
+
+    assert await breaker.allow() is False
+    assert breaker.state == CircuitState.OPEN
+
+@pytest.mark.asyncio
+async def test_shared_breaker_trusts_recent_closed_state():
+    breaker, script = shared_breaker("closed", ["open", 0])
+
+    await breaker.record(True)
+    assert await breaker.allow() is True
+    # Closed was seen just now, so Redis is not asked again
+    assert script.call_count == 1
+
+@pytest.mark.asyncio
+async def test_shared_breaker_fails_open_without_redis():
+    breaker, script = shared_breaker(ConnectionError("redis down"))
+
+    assert await breaker.allow() is True
+
+@pytest.mark.asyncio
+async def test_share_breakers_replaces_existing(monkeypatch):
+    monkeypatch.setattr(ServiceClient, "_breakers", {})
+    monkeypatch.setattr(ServiceClient, "_breaker_redis", None)
+    client = ServiceClient("http://shared-service", "shared")
+    redis = MagicMock()
+
+    ServiceClient.share_breakers(redis)
+
+    assert isinstance(client.breaker, RedisCircuitBreaker)
+    assert client.breaker.redis is redis
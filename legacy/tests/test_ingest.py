@@ -0,0 +1,50 @@
+import pytest
+import json
+from unittest.mock import AsyncMock
+from app.services.ingest import ResultIngest, INGEST_STREAM_KEY
+from app.models.worker import ParcelResult
+
+def entry(entry_id: str, worker_id: str, *results: ParcelResult):
+    results = [result.model_dump(mode="json") for result in results]
+    return (entry_id, {"worker_id": worker_id, "count": str(len(results)), "results": json.dumps(results)})
+
+@pytest.fixture
+def mock_redis():
+    return AsyncMock()
+
+@pytest.mark.asyncio
+async def test_enqueue_appends_submission(mock_redis, make_result):
+    mock_redis.xadd.return_value = "1-0"
+
+    entry_id = await ResultIngest(mock_redis).enqueue([make_result("t1"), make_result("t2")], "worker-1")
+
+    assert entry_id == "1-0"
+    args, _ = mock_redis.xadd.call_args
+    assert args[0] == INGEST_STREAM_KEY
+    assert args[1]["worker_id"] == "worker-1"
+    assert args[1]["count"] == 2
+    assert [res["task_id"] for res in json.loads(args[1]["results"])] == ["t1", "t2"]
+
+@pytest.mark.asyncio
+async def test_read_batch_coalesces_workers(mock_redis, make_result):
+    mock_redis.xautoclaim.return_value = ["0-0", [entry("1-0", "worker-1", make_result("t1"))], []]
+    mock_redis.xreadgroup.return_value = [[INGEST_STREAM_KEY, [entry("2-0", "worker-2", make_result("t2"), make_result("t3"))]]]
+
+    entry_ids, rows = await ResultIngest(mock_redis).read_batch("writer-1")
+
+    assert entry_ids == ["1-0", "2-0"]
+    assert [(res.task_id, worker_id) for res, worker_id in rows] == [
+        ("t1", "worker-1"), ("t2", "worker-2"), ("t3", "worker-2")
+    ]
+    # Something was already buffered, so the read must not block
+    assert mock_redis.xreadgroup.call_args.kwargs["block"] is None
+
+@pytest.mark.asyncio
+async def test_read_batch_blocks_when_idle(mock_redis):
+    mock_redis.xautoclaim.return_value = ["0-0", [], []]
+    mock_redis.xreadgroup.return_value = []
+
+    entry_ids, rows = await ResultIngest(mock_redis).read_batch("writer-1")
+
+    assert entry_ids == [] and rows == []
+    assert mock_redis.xreadgroup.call_args.kwargs["block"] > 0
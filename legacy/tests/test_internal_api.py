@@ -75,12 +75,13 @@ async def test_submit_results_flow(client):
         "parse_duration_ms": 100
     }]
     
-    with patch("app.api.internal.results.WorkerQueue.complete_task", new_callable=AsyncMock) as mock_complete, \
-         patch("app.api.internal.results.PropertyService.upsert_parcel", new_callable=AsyncMock) as mock_upsert:
-        mock_complete.return_value = True
-        mock_upsert.return_value = True # True means inserted
+    # process_results writes every worker's rows through upsert_rows
+    with patch("app.services.results.WorkerQueue.complete_tasks", new_callable=AsyncMock) as mock_complete, \
+         patch("app.services.results.PropertyService.upsert_rows", new_callable=AsyncMock) as mock_upsert:
+        mock_complete.return_value = [True]
+        mock_upsert.return_value = [True] # True means inserted
         
-        response = await client.post("/internal/results", json=results, headers=headers)
+        response = await client.post("/internal/parcel/results", json=results, headers=headers)
         
         assert response.status_code == 200
         assert response.json()["inserted"] == 1
@@ -102,11 +103,15 @@ async def test_heartbeat_flow(client):
     }
     
     mock_redis.reset_mock()
+    renew_script = AsyncMock(return_value=0)
+    mock_redis.register_script = MagicMock(return_value=renew_script)
     response = await client.post("/internal/heartbeat", json=status, headers=headers)
     
     assert response.status_code == 200
     assert response.json()["acknowledged"] is True
     mock_redis.hset.assert_called_once()
+    # Heartbeat renews the leases on the worker's in-flight tasks
+    renew_script.assert_called_once()
 
 @pytest.mark.asyncio
 async def test_proxy_endpoints(client):
@@ -0,0 +1,115 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from app.services import properties
+from app.services.properties import PropertyService
+
+def returning(*parcels):
+    # Rows of RETURNING parcel key columns, inserted
+    return [
+        SimpleNamespace(parcel_id=parcel_id, platform="beacon", state="FL", county="Orange", inserted=inserted)
+        for parcel_id, inserted in parcels
+    ]
+
+def inserted_rows(stmt, inserted=True):
+    params = stmt.compile().params
+    return returning(*[(value, inserted) for key, value in params.items() if key.startswith("parcel_id")])
+
+@pytest.fixture
+def mock_session():
+    session = MagicMock()
+    session.execute = AsyncMock(side_effect=inserted_rows)
+    session.begin_nested = MagicMock(side_effect=lambda: AsyncMock())
+    return session
+
+@pytest.mark.asyncio
+async def test_upsert_parcels_single_statement_per_chunk(mock_session, make_result):
+    service = PropertyService(mock_session)
+    results = [make_result(f"t{i}", f"p{i}") for i in range(5)]
+
+    outcomes = await service.upsert_parcels(results, "worker-1", chunk_size=2)
+
+    assert outcomes == [True] * 5
+    assert mock_session.execute.call_count == 3
+
+@pytest.mark.asyncio
+async def test_upsert_parcel_reports_update(mock_session, make_result):
+    service = PropertyService(mock_session)
+    mock_session.execute.side_effect = lambda stmt: inserted_rows(stmt, inserted=False)
+
+    assert await service.upsert_parcel(make_result("t1", "p1"), "worker-1") is False
+
+@pytest.mark.asyncio
+async def test_upsert_parcels_skips_unchanged_content(mock_session, make_result):
+    service = PropertyService(mock_session)
+    # p1 had the same content hash, so the conditional upsert only returns p2
+    mock_session.execute.side_effect = [returning(("p2", False))]
+
+    outcomes = await service.upsert_parcels([make_result("t1", "p1", data={"v": 1}), make_result("t2", "p2", data={"v": 2})], "worker-1")
+
+    assert outcomes == [None, False]
+    params = mock_session.execute.call_args[0][0].compile().params
+    assert params["content_hash_m0"] == service._content_hash(make_result("t3", "p1", data={"v": 1}))
+    assert params["content_hash_m0"] != params["content_hash_m1"]
+
+@pytest.mark.asyncio
+async def test_upsert_parcels_deduplicates_last_wins(mock_session, make_result):
+    service = PropertyService(mock_session)
+    results = [make_result("t1", "p1", data={"v": 1}), make_result("t2", "p2"), make_result("t3", "p1", data={"v": 2})]
+
+    outcomes = await service.upsert_parcels(results, "worker-1")
+
+    # The superseded p1 result counts as updated by the one written
+    assert outcomes == [False, True, True]
+    stmt = mock_session.execute.call_args[0][0]
+    rows = stmt.compile().params
+    # Two rows left, and p1 carries the later payload
+    assert rows["parcel_id_m0"] == "p2"
+    assert rows["parcel_id_m1"] == "p1"
+    assert rows["data_m1"] == {"v": 2}
+
+@pytest.mark.asyncio
+async def test_upsert_parcels_reports_bad_rows(mock_session, make_result):
+    service = PropertyService(mock_session)
+    results = [make_result("t1", "p1"), make_result("t2", "p2")]
+    bad_row = ValueError("bad row")
+    # Batch fails, then the row-by-row retry only fails for p2
+    mock_session.execute.side_effect = [ValueError("batch failed"), returning(("p1", False)), bad_row]
+
+    outcomes = await service.upsert_parcels(results, "worker-1")
+
+    assert outcomes == [False, bad_row]
+    assert mock_session.execute.call_count == 3
+
+@pytest.mark.asyncio
+async def test_upsert_parcels_copies_large_batches(mock_session, monkeypatch, make_result):
+    monkeypatch.setattr(properties, "COPY_THRESHOLD_ROWS", 2)
+    driver_connection = AsyncMock()
+    connection = MagicMock()
+    connection.get_raw_connection = AsyncMock(return_value=MagicMock(driver_connection=driver_connection))
+    mock_session.connection = AsyncMock(return_value=connection)
+    # Merge from staging, then clearing the load
+    mock_session.execute.side_effect = [returning(("p1", True), ("p2", False)), None]
+    service = PropertyService(mock_session)
+
+    outcomes = await service.upsert_parcels([make_result("t1", "p1"), make_result("t2", "p2")], "worker-1")
+
+    assert outcomes == [True, False]
+    _, kwargs = driver_connection.copy_records_to_table.call_args
+    assert [record[1] for record in kwargs["records"]] == ["p1", "p2"]
+    # Every record belongs to the same load
+    assert len({record[0] for record in kwargs["records"]}) == 1
+
+@pytest.mark.asyncio
+async def test_commit_invalidates_changed_parcels(mock_session, make_result):
+    mock_session.commit = AsyncMock()
+    cache = AsyncMock()
+    service = PropertyService(mock_session, cache=cache)
+    # p1 is new, p2 unchanged
+    mock_session.execute.side_effect = [returning(("p1", True))]
+
+    await service.upsert_parcels([make_result("t1", "p1"), make_result("t2", "p2")], "worker-1")
+    await service.commit()
+
+    mock_session.commit.assert_called_once()
+    cache.invalidate_properties.assert_called_once_with({"p1"})
@@ -0,0 +1,63 @@
+import pytest
+from app.services.queue_scheduler import (
+    StrictPriorityScheduler, WeightedFairScheduler, parse_platform_weights
+)
+
+def test_strict_priority_plan_order():
+    slots = StrictPriorityScheduler().plan(["beacon", "qpublic"], capacity=10)
+    
+    assert [(s.platform, s.priority) for s in slots] == [
+        ("beacon", 1), ("beacon", 2), ("beacon", 3), ("beacon", 4),
+        ("qpublic", 1), ("qpublic", 2), ("qpublic", 3), ("qpublic", 4),
+    ]
+    assert all(s.quota == 0 for s in slots)
+
+def test_weighted_fair_splits_capacity_by_platform_weight():
+    scheduler = WeightedFairScheduler(platform_weights={"beacon": 3, "qpublic": 1},
+                                      priority_weights={1: 1, 2: 0, 3: 0, 4: 0})
+    slots = scheduler.plan(["beacon", "qpublic"], capacity=8)
+    
+    quotas = {(s.platform, s.priority): s.quota for s in slots}
+    assert quotas[("beacon", 1)] == 6
+    assert quotas[("qpublic", 1)] == 2
+
+def test_weighted_fair_low_priority_ages_into_a_slot():
+    scheduler = WeightedFairScheduler(platform_weights={}, priority_weights={1: 8, 2: 4, 3: 2, 4: 1})
+    
+    p4_quotas = []
+    for _ in range(3):
+        slots = scheduler.plan(["beacon"], capacity=5)
+        p4 = next(s for s in slots if s.priority == 4)
+        p4_quotas.append(p4.quota)
+        # Priority 1 takes everything it is offered, every queue stays backlogged
+        claimed = {("beacon", s.priority): s.quota for s in slots}
+        scheduler.record(slots, claimed, backlog=[100] * len(slots))
+    
+    # 5 * 1/15 per claim: credit builds up until priority 4 gets a task
+    assert p4_quotas == [0, 0, 1]
+
+def test_weighted_fair_drained_queue_resets_credit():
+    scheduler = WeightedFairScheduler(platform_weights={}, priority_weights={1: 1, 2: 1, 3: 1, 4: 1})
+    slots = scheduler.plan(["beacon"], capacity=2)
+    scheduler.record(slots, {}, backlog=[0] * len(slots))
+    
+    slots = scheduler.plan(["beacon"], capacity=2)
+    assert all(s.credit == 0.5 for s in slots)
+
+def test_weighted_fair_rotates_platforms():
+    scheduler = WeightedFairScheduler()
+    
+    first = scheduler.plan(["beacon", "qpublic"], capacity=10)
+    second = scheduler.plan(["beacon", "qpublic"], capacity=10)
+    
+    assert first[0].platform == "beacon"
+    assert second[0].platform == "qpublic"
+
+def test_parse_platform_weights():
+    assert parse_platform_weights("beacon=3, qpublic=1,") == {"beacon": 3.0, "qpublic": 1.0}
+    assert parse_platform_weights("") == {}
+
+@pytest.mark.parametrize("value", ["beacon", "=2", "beacon=fast", "beacon=-1"])
+def test_parse_platform_weights_rejects_malformed(value):
+    with pytest.raises(ValueError):
+        parse_platform_weights(value)
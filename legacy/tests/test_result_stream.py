@@ -0,0 +1,73 @@
+import pytest
+import json
+import msgpack
+from datetime import datetime, timezone
+from app.services import result_stream
+from app.services.result_stream import iter_result_chunks, RecordTooLarge
+
+async def body(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+async def collect(stream, media_type, chunk_size=100):
+    return [chunk async for chunk in iter_result_chunks(stream, media_type, chunk_size)]
+
+@pytest.mark.asyncio
+async def test_ndjson_records_split_across_chunks(make_result):
+    payload = b"".join(json.dumps(make_result(f"t{i}").model_dump(mode="json")).encode() + b"\n" for i in range(3))
+    # Body chunks cut through the middle of records
+    chunks = [payload[i:i + 7] for i in range(0, len(payload), 7)]
+
+    batches = await collect(body(*chunks), "application/x-ndjson", chunk_size=2)
+
+    assert [[res.task_id for res in results] for results, _ in batches] == [["t0", "t1"], ["t2"]]
+    assert all(not errors for _, errors in batches)
+
+@pytest.mark.asyncio
+async def test_ndjson_reports_invalid_records(make_result):
+    payload = b"{broken\n" + json.dumps({"task_id": "t1"}).encode() + b"\n" + json.dumps(make_result("t2").model_dump(mode="json")).encode()
+
+    [(results, errors)] = await collect(body(payload), "application/x-ndjson")
+
+    assert [res.task_id for res in results] == ["t2"]
+    assert len(errors) == 2
+    assert errors[0].startswith("record 1:")
+    assert errors[1].startswith("record 2:")
+
+@pytest.mark.asyncio
+async def test_msgpack_stream_with_timestamps(make_result):
+    scraped_at = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    payload = b"".join(msgpack.packb(make_result(f"t{i}", scraped_at=scraped_at).model_dump(), datetime=True) for i in range(2))
+
+    [(results, errors)] = await collect(body(payload[:5], payload[5:]), "application/msgpack")
+
+    assert [res.task_id for res in results] == ["t0", "t1"]
+    assert results[0].scraped_at == scraped_at
+    assert errors == []
+
+@pytest.mark.asyncio
+async def test_malformed_msgpack_reported_and_rest_skipped(make_result):
+    # 0xc1 is never used in msgpack
+    payload = msgpack.packb(make_result("t0").model_dump(mode="json")) + b"\xc1" + msgpack.packb(make_result("t1").model_dump(mode="json"))
+
+    [(results, errors)] = await collect(body(payload), "application/msgpack")
+
+    assert [res.task_id for res in results] == ["t0"]
+    assert len(errors) == 1
+    assert errors[0].startswith("record 2: malformed msgpack")
+
+@pytest.mark.asyncio
+async def test_truncated_msgpack_reported(make_result):
+    payload = msgpack.packb(make_result("t0").model_dump(mode="json")) + msgpack.packb(make_result("t1").model_dump(mode="json"))[:-3]
+
+    [(results, errors)] = await collect(body(payload), "application/msgpack")
+
+    assert [res.task_id for res in results] == ["t0"]
+    assert errors == ["record 2: truncated msgpack record at end of stream"]
+
+@pytest.mark.asyncio
+async def test_oversized_record_rejected(monkeypatch):
+    monkeypatch.setattr(result_stream, "MAX_RECORD_BYTES", 16)
+
+    with pytest.raises(RecordTooLarge):
+        await collect(body(b'{"task_id": "', b'x' * 32), "application/x-ndjson")
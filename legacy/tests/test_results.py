@@ -0,0 +1,39 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.results import process_results
+
+@pytest.fixture
+def property_service():
+    service = MagicMock()
+    service.upsert_rows = AsyncMock()
+    service.commit = AsyncMock()
+    return service
+
+@pytest.fixture
+def queue():
+    return AsyncMock()
+
+@pytest.mark.asyncio
+async def test_process_results_completes_persisted_tasks(property_service, queue, make_result):
+    property_service.upsert_rows.return_value = [True, False, None]
+    results = [make_result("t1"), make_result("t2"), make_result("t3")]
+
+    response = await process_results(property_service, queue, results, "worker-1")
+
+    assert (response.inserted, response.updated, response.unchanged, response.failed) == (1, 1, 1, 0)
+    property_service.upsert_rows.assert_awaited_once_with([(res, "worker-1") for res in results])
+    property_service.commit.assert_awaited_once()
+    queue.complete_tasks.assert_awaited_once_with(
+        [("worker-1", "t1"), ("worker-1", "t2"), ("worker-1", "t3")]
+    )
+
+@pytest.mark.asyncio
+async def test_process_results_keeps_failed_rows_in_flight(property_service, queue, make_result):
+    property_service.upsert_rows.return_value = [True, ValueError("bad row")]
+
+    response = await process_results(property_service, queue, [make_result("t1"), make_result("t2")], "worker-1")
+
+    assert response.inserted == 1
+    assert response.failed == 1
+    assert response.errors == ["bad row"]
+    queue.complete_tasks.assert_awaited_once_with([("worker-1", "t1")])
@@ -0,0 +1,85 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.services.stream_queue import StreamWorkerQueue, STREAM_ENQUEUE_LUA
+from app.services.worker_queue import ENQUEUE_LUA, PROMOTE_RETRIES_LUA
+from app.models.worker import WorkTask
+
+@pytest.fixture
+def mock_redis():
+    return AsyncMock()
+
+@pytest.fixture
+def stream_queue(mock_redis):
+    return StreamWorkerQueue(mock_redis)
+
+@pytest.mark.asyncio
+async def test_pop_tasks_reads_consumer_group(stream_queue, mock_redis):
+    task = WorkTask(task_id="task-1", platform="beacon", target={}, priority=2)
+    claim_script = AsyncMock(return_value=[[task.model_dump_json()], [0, 0, 0, 0]])
+    mock_redis.register_script = MagicMock(return_value=claim_script)
+
+    tasks = await stream_queue.pop_tasks("worker-1", ["beacon"], capacity=5)
+
+    assert [t.task_id for t in tasks] == ["task-1"]
+    _, kwargs = claim_script.call_args
+    assert kwargs["keys"] == [
+        "stream:beacon:p1", "stream:beacon:p2", "stream:beacon:p3", "stream:beacon:p4",
+        "stream:inflight", "processing:worker-1:streams"
+    ]
+    # Capacity, group, consumer, then the idle time before redelivery
+    assert kwargs["args"][:4] == [5, "workers", "worker-1", 300000]
+
+@pytest.mark.asyncio
+async def test_complete_task_acks_entry(stream_queue, mock_redis):
+    complete_script = AsyncMock(return_value=1)
+    mock_redis.register_script = MagicMock(return_value=complete_script)
+
+    assert await stream_queue.complete_task("worker-1", "task-1") is True
+    _, kwargs = complete_script.call_args
+    assert kwargs["keys"][0] == "stream:inflight"
+    assert kwargs["args"] == ["task-1", "workers", "worker-1"]
+
+@pytest.mark.asyncio
+async def test_requeue_scripts_append_to_streams(stream_queue, mock_redis):
+    mock_redis.register_script = MagicMock(return_value=AsyncMock(return_value=0))
+
+    await stream_queue.promote_retries()
+
+    lua = mock_redis.register_script.call_args[0][0]
+    assert lua.startswith(STREAM_ENQUEUE_LUA)
+    assert lua[len(STREAM_ENQUEUE_LUA):] == PROMOTE_RETRIES_LUA[len(ENQUEUE_LUA):]
+
+@pytest.mark.asyncio
+async def test_renew_leases_without_held_streams(stream_queue, mock_redis):
+    mock_redis.smembers.return_value = set()
+
+    assert await stream_queue.renew_leases("worker-1") == 0
+    mock_redis.register_script.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_claim_returns_same_id_entries_from_every_stream(live_redis):
+    queue = StreamWorkerQueue(live_redis)
+    # One bulk push lands in several streams within the same millisecond, so IDs repeat across them
+    await queue.push_tasks([
+        WorkTask(task_id=f"task-{i}", platform="beacon", target={"i": i}, priority=1 + i % 4)
+        for i in range(10)
+    ])
+
+    tasks = await queue.pop_tasks("worker-1", ["beacon"], capacity=10)
+
+    assert sorted(t.task_id for t in tasks) == sorted(f"task-{i}" for i in range(10))
+    pending = [await live_redis.xpending(f"stream:beacon:p{p}", "workers") for p in range(1, 5)]
+    assert sum(p["pending"] for p in pending) == 10
+
+@pytest.mark.asyncio
+async def test_complete_and_fail_require_the_holding_worker(live_redis):
+    queue = StreamWorkerQueue(live_redis)
+    await queue.push_tasks([
+        WorkTask(task_id=f"task-{i}", platform="beacon", target={"i": i}) for i in range(2)
+    ])
+    first, second = await queue.pop_tasks("worker-1", ["beacon"], capacity=2)
+
+    assert await queue.complete_task("worker-2", first.task_id) is False
+    assert (await queue.fail_task("worker-2", second.task_id)).status == "not_found"
+    assert await queue.complete_task("worker-1", first.task_id) is True
+    assert (await queue.fail_task("worker-1", second.task_id)).status == "retry_scheduled"
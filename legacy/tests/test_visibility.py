@@ -0,0 +1,65 @@
+import json
+from pathlib import Path
+import pytest
+from app.models.auth import UserTier
+from app.services import visibility
+from app.services.visibility import project_fields, field_set_version, MAPPED_FIELDS
+
+# Property details as the parser returns them to each tier
+PARSER_FIXTURES = Path(__file__).parent / "fixtures" / "parser"
+
+def parser_response(tier: UserTier) -> str:
+    return (PARSER_FIXTURES / f"property_{tier.value}.json").read_text()
+
+PAYLOAD = json.dumps({
+    "parcel_id": "p1",
+    "address": "1 Main St",
+    "market_value": 120000,
+    "owner_name": "John Smith",
+    "miw_score": 0.8,
+    "worker_id": "worker-1",
+})
+
+def test_project_fields_per_tier():
+    assert json.loads(project_fields(PAYLOAD, UserTier.ANONYMOUS)) == {"parcel_id": "p1", "address": "1 Main St"}
+    assert set(json.loads(project_fields(PAYLOAD, UserTier.STARTER))) == {
+        "parcel_id", "address", "market_value", "owner_name"
+    }
+    # Paying tiers still only see listed fields; internal ones stay hidden
+    for tier in (UserTier.PREMIUM, UserTier.ENTERPRISE):
+        assert set(json.loads(project_fields(PAYLOAD, tier))) == {
+            "parcel_id", "address", "market_value", "owner_name", "miw_score"
+        }
+    # Only internal callers get the canonical payload as it is
+    assert project_fields(PAYLOAD, UserTier.INTERNAL) is PAYLOAD
+
+def test_project_fields_leaves_non_objects():
+    assert project_fields("[1, 2]", UserTier.ANONYMOUS) == "[1, 2]"
+    assert project_fields(b"not json", UserTier.ANONYMOUS) == b"not json"
+
+@pytest.mark.parametrize("tier", list(UserTier))
+def test_projection_matches_parser_response(tier):
+    canonical = parser_response(UserTier.INTERNAL)
+    assert json.loads(project_fields(canonical, tier)) == json.loads(parser_response(tier))
+
+def test_parser_fields_are_mapped():
+    # A field the parser starts returning must be given a tier before it can be shown
+    assert json.loads(parser_response(UserTier.INTERNAL)).keys() <= MAPPED_FIELDS
+
+def test_unmapped_fields_are_reported(monkeypatch):
+    warnings = []
+    monkeypatch.setattr(visibility, "_reported_unmapped", set())
+    monkeypatch.setattr(visibility.logger, "warning", lambda event, **kw: warnings.append((event, kw)))
+    payload = json.dumps({"parcel_id": "p1", "flood_zone": "AE"})
+
+    assert json.loads(project_fields(payload, UserTier.PREMIUM)) == {"parcel_id": "p1"}
+    project_fields(payload, UserTier.FREE)
+    assert warnings == [("unmapped_property_fields", {"fields": ["flood_zone"]})]
+
+def test_field_set_version_per_tier():
+    versions = {tier: field_set_version(tier) for tier in UserTier}
+    assert versions[UserTier.INTERNAL] == "all"
+    # Tiers with the same fields share a version; the others differ
+    assert versions[UserTier.PREMIUM] == versions[UserTier.ENTERPRISE]
+    assert len({versions[tier] for tier in (UserTier.ANONYMOUS, UserTier.FREE, UserTier.STARTER, UserTier.PREMIUM)}) == 4
+    assert field_set_version(UserTier.FREE) == field_set_version(UserTier.FREE)
@@ -1,7 +1,10 @@
 import pytest
+import asyncio
 import json
 from unittest.mock import AsyncMock, MagicMock
+from app.services import worker_queue as worker_queue_module
 from app.services.worker_queue import WorkerQueue
+from app.services.queue_notifier import queue_notifier
 from app.models.worker import WorkTask
 
 @pytest.fixture
@@ -20,51 +23,304 @@ async def test_push_task(worker_queue, mock_redis):
         target={"parcel_id": "123"},
         priority=1
     )
-    await worker_queue.push_task(task)
+    push_script = AsyncMock(return_value=1)
+    mock_redis.register_script = MagicMock(return_value=push_script)
     
-    # Check if lpush was called with the right key and data
-    queue_key = "queue:beacon:p1"
-    mock_redis.lpush.assert_called_once()
-    args, _ = mock_redis.lpush.call_args
-    assert args[0] == queue_key
-    assert json.loads(args[1])["task_id"] == "task-1"
+    assert await worker_queue.push_task(task) is True
+    
+    # A single push takes the dedup fingerprint like a bulk enqueue
+    _, kwargs = push_script.call_args
+    assert kwargs["keys"] == ["dedup:fingerprints", "dedup:tasks"]
+    assert kwargs["args"][0] == "task-1"
+    assert json.loads(kwargs["args"][2])["task_id"] == "task-1"
+
+@pytest.mark.asyncio
+async def test_push_tasks_bulk_dedup(worker_queue, mock_redis):
+    tasks = [
+        WorkTask(task_id=f"task-{i}", platform="beacon", target={"parcel_id": str(i % 2)})
+        for i in range(3)
+    ]
+    bulk_script = AsyncMock()
+    mock_redis.register_script = MagicMock(return_value=bulk_script)
+    
+    pipe = AsyncMock()
+    pipe.execute.return_value = [1, 1]
+    mock_redis.pipeline = MagicMock()
+    mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+    
+    queued, duplicates = await worker_queue.push_tasks(tasks, chunk_size=2)
+    
+    assert (queued, duplicates) == (2, 1)
+    # Two chunks, one pipeline round trip
+    assert bulk_script.call_count == 2
+    pipe.execute.assert_called_once()
+    _, kwargs = bulk_script.call_args_list[0]
+    assert kwargs["keys"] == ["dedup:fingerprints", "dedup:tasks"]
+    # Same (platform, target) yields the same fingerprint
+    first, second = bulk_script.call_args_list
+    assert first.kwargs["args"][1] == second.kwargs["args"][1]
 
 @pytest.mark.asyncio
 async def test_pop_tasks_priority_order(worker_queue, mock_redis):
-    # Setup mock to return a task only for p1
     task_p1 = WorkTask(task_id="urgent", platform="beacon", target={}, priority=1)
-    task_p2 = WorkTask(task_id="normal", platform="beacon", target={}, priority=2)
     
-    # We want to simulate rpoplpush returning None for p1, p2, p3... except one
-    mock_redis.rpoplpush.side_effect = [
-        task_p1.model_dump_json(), # beacon p1
-        None, # beacon p2 (shouldn't even be called if capacity is 1)
-    ]
+    # The claim runs server-side as a single Lua script call
+    claim_script = AsyncMock(return_value=[[task_p1.model_dump_json()], [0, 0, 0, 0]])
+    mock_redis.register_script = MagicMock(return_value=claim_script)
     
     tasks = await worker_queue.pop_tasks("worker-1", ["beacon"], capacity=1)
     
     assert len(tasks) == 1
     assert tasks[0].task_id == "urgent"
-    # Verify rpoplpush was called for p1
-    mock_redis.rpoplpush.assert_called_with("queue:beacon:p1", "processing:worker-1")
+    claim_script.assert_called_once()
+    _, kwargs = claim_script.call_args
+    # Priorities 1..4 in order, then the worker's keys and the leased workers set
+    assert kwargs["keys"] == [
+        "queue:beacon:p1", "queue:beacon:p2", "queue:beacon:p3", "queue:beacon:p4",
+        "processing:worker-1", "processing:worker-1:tasks", "processing:worker-1:leases",
+        "processing:workers"
+    ]
+    assert kwargs["args"][0] == 1
 
 @pytest.mark.asyncio
-async def test_complete_task_success(worker_queue, mock_redis):
-    task = WorkTask(task_id="task-1", platform="beacon", target={}, priority=3)
-    raw_task = task.model_dump_json()
+async def test_pop_tasks_single_round_trip(worker_queue, mock_redis):
+    claim_script = AsyncMock(return_value=[[], [0] * 8])
+    mock_redis.register_script = MagicMock(return_value=claim_script)
+    
+    tasks = await worker_queue.pop_tasks("worker-1", ["beacon", "qpublic"], capacity=100)
+    
+    assert tasks == []
+    claim_script.assert_called_once()
+    mock_redis.rpoplpush.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_pop_tasks_long_poll_wakes_on_notify(worker_queue, mock_redis):
+    task = WorkTask(task_id="late", platform="beacon", target={}, priority=3)
+    claim_script = AsyncMock(side_effect=[[[], [0] * 4], [[task.model_dump_json()], [0] * 4]])
+    mock_redis.register_script = MagicMock(return_value=claim_script)
+    
+    asyncio.get_running_loop().call_later(0.05, queue_notifier.notify, "beacon")
+    tasks = await asyncio.wait_for(
+        worker_queue.pop_tasks("worker-1", ["beacon"], capacity=1, wait=30),
+        timeout=2
+    )
+    
+    assert [t.task_id for t in tasks] == ["late"]
+    assert claim_script.call_count == 2
+
+@pytest.mark.asyncio
+async def test_pop_tasks_long_poll_times_out(worker_queue, mock_redis):
+    claim_script = AsyncMock(return_value=[[], [0] * 4])
+    mock_redis.register_script = MagicMock(return_value=claim_script)
     
-    mock_redis.lrange.return_value = [raw_task]
+    tasks = await worker_queue.pop_tasks("worker-1", ["beacon"], capacity=1, wait=0.1)
+    
+    assert tasks == []
+    assert claim_script.call_count == 2
+
+@pytest.mark.asyncio
+async def test_complete_task_success(worker_queue, mock_redis):
+    complete_script = AsyncMock(return_value=1)
+    mock_redis.register_script = MagicMock(return_value=complete_script)
     
     result = await worker_queue.complete_task("worker-1", "task-1")
     
     assert result is True
-    mock_redis.lrem.assert_called_once_with("processing:worker-1", 1, raw_task)
+    complete_script.assert_called_once_with(
+        keys=["processing:worker-1", "processing:worker-1:tasks", "processing:worker-1:leases",
+              "retry:attempts", "dedup:fingerprints", "dedup:tasks"],
+        args=["task-1"]
+    )
+    # No scan of the processing list
+    mock_redis.lrange.assert_not_called()
 
 @pytest.mark.asyncio
 async def test_complete_task_not_found(worker_queue, mock_redis):
-    mock_redis.lrange.return_value = []
+    complete_script = AsyncMock(return_value=0)
+    mock_redis.register_script = MagicMock(return_value=complete_script)
     
     result = await worker_queue.complete_task("worker-1", "task-1")
     
     assert result is False
-    mock_redis.lrem.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_complete_tasks_pipelined(worker_queue, mock_redis):
+    complete_script = AsyncMock()
+    mock_redis.register_script = MagicMock(return_value=complete_script)
+    pipe = AsyncMock()
+    pipe.execute.return_value = [1, 0]
+    mock_redis.pipeline = MagicMock()
+    mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+    
+    result = await worker_queue.complete_tasks([("worker-1", "task-1"), ("worker-2", "task-2")])
+    
+    assert result == [True, False]
+    assert complete_script.call_count == 2
+    _, kwargs = complete_script.call_args
+    assert kwargs["client"] is pipe
+    assert kwargs["keys"][0] == "processing:worker-2"
+    assert kwargs["args"] == ["task-2"]
+    pipe.execute.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_reap_expired_leases(worker_queue, mock_redis):
+    mock_redis.smembers.return_value = {"worker-1"}
+    reap_script = AsyncMock()
+    mock_redis.register_script = MagicMock(return_value=reap_script)
+    
+    pipe = AsyncMock()
+    pipe.execute.return_value = [2]
+    mock_redis.pipeline = MagicMock()
+    mock_redis.pipeline.return_value.__aenter__.return_value = pipe
+    
+    requeued = await worker_queue.reap_expired_leases()
+    
+    assert requeued == 2
+    _, kwargs = reap_script.call_args
+    assert kwargs["keys"] == [
+        "processing:worker-1", "processing:worker-1:tasks", "processing:worker-1:leases",
+        "processing:workers"
+    ]
+    assert kwargs["client"] is pipe
+
+@pytest.mark.asyncio
+async def test_reap_expired_leases_no_workers(worker_queue, mock_redis):
+    mock_redis.smembers.return_value = set()
+    
+    assert await worker_queue.reap_expired_leases() == 0
+
+@pytest.mark.asyncio
+async def test_fail_task_schedules_retry(worker_queue, mock_redis):
+    fail_script = AsyncMock(return_value=[1, 2, 45])
+    mock_redis.register_script = MagicMock(return_value=fail_script)
+    
+    result = await worker_queue.fail_task("worker-1", "task-1", error="timeout")
+    
+    assert result.status == "retry_scheduled"
+    assert result.attempts == 2
+    assert result.retry_in == 45
+    _, kwargs = fail_script.call_args
+    assert kwargs["keys"][3:6] == ["retry:scheduled", "retry:attempts", "dlq:tasks"]
+    assert kwargs["args"][0] == "task-1"
+    assert kwargs["args"][-1] == "timeout"
+
+@pytest.mark.asyncio
+async def test_fail_task_dead_lettered(worker_queue, mock_redis):
+    mock_redis.register_script = MagicMock(return_value=AsyncMock(return_value=[2, 5, 0]))
+    
+    result = await worker_queue.fail_task("worker-1", "task-1")
+    
+    assert result.status == "dead_lettered"
+    assert result.attempts == 5
+
+@pytest.mark.asyncio
+async def test_fail_task_not_found(worker_queue, mock_redis):
+    mock_redis.register_script = MagicMock(return_value=AsyncMock(return_value=[0, 0, 0]))
+    
+    result = await worker_queue.fail_task("worker-1", "missing")
+    
+    assert result.status == "not_found"
+
+# The tests below run the Lua scripts against the Redis in REDIS_TEST_URL
+
+def live_task(task_id: str, priority: int = 3, **target) -> WorkTask:
+    return WorkTask(task_id=task_id, platform="beacon", target=target or {"id": task_id}, priority=priority)
+
+@pytest.mark.asyncio
+async def test_live_bulk_enqueue_claim_and_complete(live_redis):
+    queue = WorkerQueue(live_redis)
+    queued, duplicates = await queue.push_tasks([
+        live_task("low", priority=4), live_task("urgent", priority=1), live_task("again", id="low")
+    ])
+    assert (queued, duplicates) == (2, 1)
+
+    tasks = await queue.pop_tasks("worker-1", ["beacon"], capacity=5)
+
+    assert [t.task_id for t in tasks] == ["urgent", "low"]
+    assert await live_redis.llen("processing:worker-1") == 2
+    assert set(await live_redis.hkeys("processing:worker-1:tasks")) == {"urgent", "low"}
+    assert await live_redis.smembers("processing:workers") == {"worker-1"}
+
+    assert await queue.complete_tasks([("worker-1", "urgent"), ("worker-1", "missing")]) == [True, False]
+    assert await queue.complete_task("worker-1", "low") is True
+    assert await live_redis.llen("processing:worker-1") == 0
+    assert await live_redis.hlen("processing:worker-1:tasks") == 0
+    # Completion releases the fingerprint, so the same target can be queued again
+    assert await queue.push_tasks([live_task("again", id="low")]) == (1, 0)
+
+@pytest.mark.asyncio
+async def test_live_fail_retries_then_promotes(live_redis, monkeypatch):
+    monkeypatch.setattr(worker_queue_module, "RETRY_BASE_DELAY_SECONDS", 0)
+    queue = WorkerQueue(live_redis)
+    await queue.push_tasks([live_task("t1")])
+    await queue.pop_tasks("worker-1", ["beacon"], capacity=1)
+
+    result = await queue.fail_task("worker-1", "t1", error="timeout")
+
+    assert (result.status, result.attempts) == ("retry_scheduled", 1)
+    assert await live_redis.llen("processing:worker-1") == 0
+    assert await queue.promote_retries() == 1
+    assert [t.task_id for t in await queue.pop_tasks("worker-1", ["beacon"], capacity=1)] == ["t1"]
+
+@pytest.mark.asyncio
+async def test_live_dead_letter_and_replay(live_redis, monkeypatch):
+    monkeypatch.setattr(worker_queue_module, "MAX_ATTEMPTS", 1)
+    queue = WorkerQueue(live_redis)
+    await queue.push_tasks([live_task("t1")])
+    await queue.pop_tasks("worker-1", ["beacon"], capacity=1)
+
+    assert (await queue.fail_task("worker-1", "t1", error="boom")).status == "dead_lettered"
+    total, dead_letters = await queue.list_dead_letters()
+    assert total == 1 and dead_letters[0].error == "boom"
+
+    assert await queue.replay_dead_letter("t1") is True
+    assert await queue.replay_dead_letter("t1") is False
+    assert [t.task_id for t in await queue.pop_tasks("worker-1", ["beacon"], capacity=1)] == ["t1"]
+
+@pytest.mark.asyncio
+async def test_live_push_and_replay_take_the_fingerprint(live_redis, monkeypatch):
+    monkeypatch.setattr(worker_queue_module, "MAX_ATTEMPTS", 1)
+    queue = WorkerQueue(live_redis)
+    assert await queue.push_task(live_task("t1")) is True
+    assert await queue.push_task(live_task("t1-dup", id="t1")) is False
+    await queue.pop_tasks("worker-1", ["beacon"], capacity=1)
+    await queue.fail_task("worker-1", "t1")
+
+    assert await queue.replay_dead_letter("t1") is True
+    # The replayed task holds the fingerprint again
+    assert await queue.push_tasks([live_task("t1-dup", id="t1")]) == (0, 1)
+    assert await live_redis.llen("queue:beacon:p3") == 1
+
+@pytest.mark.asyncio
+async def test_live_replay_skips_target_queued_meanwhile(live_redis, monkeypatch):
+    monkeypatch.setattr(worker_queue_module, "MAX_ATTEMPTS", 1)
+    queue = WorkerQueue(live_redis)
+    await queue.push_tasks([live_task("t1")])
+    await queue.pop_tasks("worker-1", ["beacon"], capacity=1)
+    await queue.fail_task("worker-1", "t1")
+    await queue.push_tasks([live_task("t1-again", id="t1")])
+
+    assert await queue.replay_dead_letter("t1") is True
+    assert await live_redis.hlen("dlq:tasks") == 0
+    assert [t.task_id for t in await queue.pop_tasks("worker-1", ["beacon"], capacity=5)] == ["t1-again"]
+
+@pytest.mark.asyncio
+async def test_live_renew_and_reap_leases(live_redis):
+    queue = WorkerQueue(live_redis)
+    await queue.push_tasks([live_task("t1"), live_task("t2")])
+    await queue.pop_tasks("worker-1", ["beacon"], capacity=2)
+
+    assert await queue.renew_leases("worker-1") == 2
+    assert await queue.reap_expired_leases() == 0
+
+    # Let one lease lapse
+    await live_redis.zadd("processing:worker-1:leases", {"t1": 0})
+    assert await queue.reap_expired_leases() == 1
+    assert await live_redis.hkeys("processing:worker-1:tasks") == ["t2"]
+    assert await live_redis.smembers("processing:workers") == {"worker-1"}
+
+    await live_redis.zadd("processing:worker-1:leases", {"t2": 0})
+    assert await queue.reap_expired_leases() == 1
+    assert await live_redis.smembers("processing:workers") == set()
+    assert await live_redis.llen("processing:worker-1") == 0
+    assert sorted(t.task_id for t in await queue.pop_tasks("worker-2", ["beacon"], capacity=5)) == ["t1", "t2"]
@@ -0,0 +1,15 @@
+-- Unlogged staging table for COPY bulk loads into parcels.
+-- Each load copies its rows under a fresh load_id, merges them into parcels
+-- with INSERT ... SELECT ... ON CONFLICT and deletes them again.
+CREATE UNLOGGED TABLE IF NOT EXISTS parcels_staging (
+    load_id UUID NOT NULL,
+    parcel_id VARCHAR(255) NOT NULL,
+    platform VARCHAR(64) NOT NULL,
+    state VARCHAR(8) NOT NULL,
+    county VARCHAR(255) NOT NULL,
+    data JSONB NOT NULL,
+    scraped_at TIMESTAMPTZ NOT NULL,
+    worker_id VARCHAR(255)
+);
+
+CREATE INDEX IF NOT EXISTS idx_parcels_staging_load_id ON parcels_staging (load_id);
@@ -0,0 +1,4 @@
+-- Content hash of the parsed parcel data; re-scrapes with an unchanged hash
+-- are not written again
+ALTER TABLE parcels ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE parcels_staging ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);